@@ -1,12 +1,18 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
-import hashlib
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import time
+import io
 from streamlit_option_menu import option_menu
-import plotly.express as px
-import joblib
-import numpy as np
+# Only light, standard-library-backed modules at the top so the login page
+# renders without pandas, plotly or the ML stack. Each tab imports what it
+# needs when it is first opened; Python caches the modules per process.
+from metrics import export_to_file, snapshot, timed
+from model_registry import model_metadata, model_stats
+from result_cache import cache
+from auth import (SESSION_COOKIE, SESSION_GRANT_PATH, AuthError, add_user, client_ip, create_session,
+                  end_session, session_grant, session_user, verify_user, user_exists)
+from db import init_db
 
 # Page configuration
 st.set_page_config(
@@ -134,93 +140,62 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Database functions
-def init_db():
-    conn = sqlite3.connect('mfi_credit_risk.db')
-    c = conn.cursor()
-    
-    # Create users table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT,
-            email TEXT,
-            full_name TEXT,
-            role TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create applications table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS applications (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            applicant_name TEXT,
-            age INTEGER,
-            gender TEXT,
-            marital_status TEXT,
-            employment_type TEXT,
-            monthly_income REAL,
-            loan_amount REAL,
-            loan_type TEXT,
-            purpose TEXT,
-            risk_score REAL,
-            risk_category TEXT,
-            decision TEXT,
-            officer_username TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (officer_username) REFERENCES users(username)
-        )
-    ''')
-    
-    # Create borrowers table
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS borrowers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            borrower_id TEXT,
-            name TEXT,
-            current_risk_level TEXT,
-            last_updated TIMESTAMP,
-            officer_username TEXT,
-            FOREIGN KEY (officer_username) REFERENCES users(username))
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def add_user(username, password, email, full_name, role="credit_officer"):
-    conn = sqlite3.connect('mfi_credit_risk.db')
-    c = conn.cursor()
-    try:
-        c.execute(
-            "INSERT INTO users VALUES (?, ?, ?, ?, ?, datetime('now'))",
-            (username, hashlib.sha256(password.encode()).hexdigest(), email, full_name, role))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-def verify_user(username, password):
-    conn = sqlite3.connect('mfi_credit_risk.db')
-    c = conn.cursor()
-    c.execute(
-        "SELECT 1 FROM users WHERE username = ? AND password = ?",
-        (username, hashlib.sha256(password.encode()).hexdigest()))
-    result = c.fetchone() is not None
-    conn.close()
-    return result
-
-def user_exists(username):
-    conn = sqlite3.connect('mfi_credit_risk.db')
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-    result = c.fetchone() is not None
-    conn.close()
-    return result
-
 # Login Page
+def client_request():
+    # HTTP request that opened this browser session's websocket; None outside
+    # a browser session
+    ctx = get_script_run_ctx()
+    if ctx is None or not runtime.exists():
+        return None
+    from tornado.httputil import HTTPServerRequest
+
+    client = runtime.get_instance().get_client(ctx.session_id)
+    request = getattr(client, "request", None)
+    return request if isinstance(request, HTTPServerRequest) else None
+
+
+def session_cookie():
+    request = client_request()
+    morsel = request.cookies.get(SESSION_COOKIE) if request is not None else None
+    return morsel.value if morsel is not None else None
+
+
+# Login state lives in the shared session store, not only in session_state:
+# the token comes from this session's own login or from the HttpOnly session
+# cookie the browser connected with, so a reload or a reconnect that lands on
+# another worker process restores the same user
+def restore_session():
+    token = st.session_state.get("session_token") or session_cookie()
+    username = session_user(token)
+    if username is None:
+        if st.session_state.get("authenticated"):
+            st.session_state.clear()  # signed out or expired elsewhere
+        st.session_state.authenticated = False
+    else:
+        st.session_state.authenticated = True
+        st.session_state.username = username
+        st.session_state.session_token = token
+
+
+def send_session_cookie():
+    # Right after a login, the browser trades the single-use grant for the
+    # HttpOnly session cookie at balancer.py. Without the balancer the request
+    # finds nothing and the login lasts as long as this browser session.
+    grant = st.session_state.pop("session_grant", None)
+    if grant:
+        import streamlit.components.v1 as components
+        components.html(f"<script>fetch('{SESSION_GRANT_PATH}', {{method: 'POST', body: '{grant}', "
+                        f"credentials: 'same-origin'}});</script>", height=0)
+
+
+def client_address():
+    # Best-effort client IP for login throttling; None outside a browser session
+    request = client_request()
+    if request is None:
+        return None
+    return client_ip(request.remote_ip, request.headers.get("X-Forwarded-For"))
+
+
 def login_page():
     st.markdown("""
     <div style="display: flex; justify-content: center; padding-top: 40px;">
@@ -272,14 +247,22 @@ def login_page():
                     """, unsafe_allow_html=True)
 
                 if st.form_submit_button("LOGIN", type="primary", use_container_width=True):
-                    if verify_user(username, password):
-                        st.session_state["authenticated"] = True
-                        st.session_state["username"] = username
-                        st.success("Login successful!")
-                        time.sleep(1)
-                        st.rerun()
+                    try:
+                        valid = verify_user(username, password, client_address())
+                    except AuthError as e:
+                        st.error(str(e))
                     else:
-                        st.error("Invalid credentials")
+                        if valid:
+                            token = create_session(username, remember)
+                            st.session_state["session_token"] = token
+                            st.session_state["session_grant"] = session_grant(token, remember)
+                            st.session_state["authenticated"] = True
+                            st.session_state["username"] = username
+                            st.success("Login successful!")
+                            time.sleep(1)
+                            st.rerun()
+                        else:
+                            st.error("Invalid credentials")
 
         with signup_tab:
             with st.form("Signup Form"):
@@ -300,10 +283,16 @@ def login_page():
                         st.warning("Please accept the Terms & Conditions")
                     elif user_exists(username):
                         st.error("Username already exists")
-                    elif add_user(username, password, email, full_name):
-                        st.success("Account created successfully! Please login.")
                     else:
-                        st.error("Error creating account")
+                        try:
+                            created = add_user(username, password, email, full_name)
+                        except AuthError as e:
+                            st.error(str(e))
+                        else:
+                            if created:
+                                st.success("Account created successfully! Please login.")
+                            else:
+                                st.error("Error creating account")
 
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -387,8 +376,21 @@ def sidebar():
             }
         )
 
-        # System Status
-        st.markdown("""
+        # System Status (live numbers from this worker process)
+        stats = model_stats()
+        if stats is not None:
+            model_status = (f"Model Loaded: {time.strftime('%H:%M', time.localtime(stats['loaded_at']))} "
+                            f"({stats['load_seconds']:.1f}s)")
+        else:
+            model_status = "Model Loaded: not yet"
+        metadata = model_metadata()
+        accuracy_status = (f"Model Accuracy: {metadata['accuracy']:.0%}" if metadata
+                           else "Model Accuracy: n/a")
+        timers, counters = snapshot()
+        screening = timers.get("score_application")  # single assessments only
+        latency_status = (f"Scoring p95: {screening['p95_ms']:.1f} ms" if screening
+                          else "Scoring p95: no requests yet")
+        st.markdown(f"""
         <div style="background: rgba(255,255,255,0.15);
                     backdrop-filter: blur(5px);
                     border-radius: 10px;
@@ -402,18 +404,34 @@ def sidebar():
             </div>
             <div style="display: flex; align-items: center; margin-bottom: 10px;">
                 <div style="width: 10px; height: 10px; background: #2196F3; border-radius: 50%; margin-right: 10px;"></div>
-                <span style="color: white; font-size: 0.9rem;">Model Accuracy: 89%</span>
+                <span style="color: white; font-size: 0.9rem;">{accuracy_status}</span>
             </div>
-            <div style="display: flex; align-items: center;">
+            <div style="display: flex; align-items: center; margin-bottom: 10px;">
                 <div style="width: 10px; height: 10px; background: #FFC107; border-radius: 50%; margin-right: 10px;"></div>
-                <span style="color: white; font-size: 0.9rem;">Last Updated: Today</span>
+                <span style="color: white; font-size: 0.9rem;">{model_status}</span>
+            </div>
+            <div style="display: flex; align-items: center;">
+                <div style="width: 10px; height: 10px; background: #E91E63; border-radius: 50%; margin-right: 10px;"></div>
+                <span style="color: white; font-size: 0.9rem;">{latency_status}</span>
             </div>
         </div>
         """, unsafe_allow_html=True)
 
+        with st.expander("📈 Performance"):
+            if timers:
+                st.dataframe(
+                    [{"Stage": name, "Calls": t["count"], "p50 (ms)": round(t["p50_ms"], 2),
+                      "p95 (ms)": round(t["p95_ms"], 2)} for name, t in timers.items()],
+                    hide_index=True, use_container_width=True)
+            cache_stats = cache.stats()
+            st.caption(f"Result cache hit rate {cache_stats['hit_rate']:.0%} "
+                       f"({cache_stats['entries']} entries) • "
+                       f"{counters.get('rows_scored', 0):,} rows scored")
+
         # End Session Button
         st.markdown("---")
         if st.button("⏹️ Sign Out", use_container_width=True):
+            end_session(st.session_state.get("session_token"))
             st.session_state.clear()
             st.success("Signed out successfully.")
             st.rerun()
@@ -439,15 +457,20 @@ def dashboard_tab():
     </div>
     """, unsafe_allow_html=True)
 
-    # Load data
-    df = pd.read_excel("MFI_Credit_Risk_Data.xlsx", sheet_name="Loan_Screening_Model")
+    from charts import income_loan_figure, purpose_figure
+    from data_store import LOAN_SHEET, dataset_version, load_loans
+    from kpis import portfolio_kpis, screening_kpis
+    from queries import PAGE_SIZES, paginate
 
-    # KPIs
-    total_apps = len(df)
-    approved = df[df["default_status"] == 0]
-    approval_rate = round((len(approved) / total_apps) * 100, 1)
-    avg_loan_amount = round(df["loan_amount_usd"].mean(), 2)
-    high_risk = len(df[df["default_status"] == 1])
+    # Load data (columnar cache, re-parsed only when the workbook changes)
+    df = load_loans()
+
+    # KPIs (cached per dataset version)
+    kpis = portfolio_kpis()
+    total_apps = kpis["total_apps"]
+    approval_rate = kpis["approval_rate"]
+    avg_loan_amount = kpis["avg_loan_amount"]
+    high_risk = kpis["high_risk"]
 
     col1, col2, col3, col4 = st.columns(4)
     with col1:
@@ -483,27 +506,36 @@ def dashboard_tab():
         </div>
         """, unsafe_allow_html=True)
 
+    # Screening activity (incremental aggregates over the applications table)
+    screening = screening_kpis()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Screened Applications", f"{screening['total']:,}")
+    col2.metric("Screening Approval Rate", f"{screening['approval_rate']}%")
+    col3.metric("Avg Screened Loan", f"${screening['avg_loan_amount']}")
+    col4.metric("Rule Overrides", f"{screening['overridden']:,}")
+
     # Charts
     col1, col2 = st.columns(2)
     with col1:
         st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">Income vs Loan Amount</h2>', unsafe_allow_html=True)
-        fig = px.scatter(df, x="monthly_income_usd", y="loan_amount_usd",
-                         color=df["default_status"].map({0: "Approved", 1: "Defaulted"}),
-                         labels={"color": "Status"})
+        fig = income_loan_figure(df, dataset_version())
         st.plotly_chart(fig, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col2:
         st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">Loan Purpose Distribution</h2>', unsafe_allow_html=True)
-        purpose_data = df["purpose_of_loan"].value_counts().reset_index()
-        purpose_data.columns = ["Purpose", "Count"]
-        fig = px.pie(purpose_data, values="Count", names="Purpose", hole=0.4)
+        fig = purpose_figure(kpis["purpose_counts"], kpis["version"])
         st.plotly_chart(fig, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
     # Application Table
     st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">Historical Applications Data</h2>', unsafe_allow_html=True)
-    st.dataframe(df.tail(10).reset_index(drop=True), use_container_width=True)
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, key="history_page_size")
+    history_page = st.number_input("Page (most recent first)", min_value=1, value=1, step=1, key="history_page")
+    loans_dataset = (LOAN_SHEET, dataset_version())
+    page_df, total, n_pages = paginate(df, loans_dataset, history_page, page_size, ascending=False)
+    st.dataframe(page_df, use_container_width=True)
+    st.caption(f"Page {min(history_page, n_pages)} of {n_pages} · {total:,} applications")
     st.markdown("</div>", unsafe_allow_html=True)
 
 
@@ -517,7 +549,15 @@ def borrower_monitoring_tab():
     </div>
     """, unsafe_allow_html=True)
 
-    df = pd.read_excel("MFI_Credit_Risk_Data.xlsx", sheet_name="Borrower_Tracking_Data")
+    from charts import risk_level_figure
+    from data_store import BORROWER_SHEET, dataset_version, load_borrowers
+    from drift import PSI_MODERATE, drift_report
+    from kpis import monitored_borrower_kpis
+    from queries import PAGE_SIZES, paginate
+    from rescoring import rescoring_status, with_rescored_levels
+
+    # Workbook borrowers, with the latest re-scoring run's levels alongside
+    df, version = with_rescored_levels(load_borrowers(), dataset_version())
 
     # KPIs
     st.markdown("""
@@ -527,20 +567,51 @@ def borrower_monitoring_tab():
     """, unsafe_allow_html=True)
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("Borrowers Tracked", len(df))
-    col2.metric("Avg Repayment Score", f"{df['repayment_history_score'].mean():.2f}")
-    col3.metric("High Risk Borrowers", len(df[df['current_risk_level'] == 'High']))
+    summary = monitored_borrower_kpis(df, version)
+    col1.metric("Borrowers Tracked", summary["borrowers"])
+    col2.metric("Avg Repayment Score", f"{summary['avg_repayment_score']:.2f}")
+    col3.metric("High Risk Borrowers", summary["high_risk"])
+    rescored = rescoring_status()
+    if rescored["last_run"]:
+        st.caption(f"Risk levels re-scored for {rescored['borrowers']:,} borrowers · last run {rescored['last_run']} UTC"
+                   f" · {summary['rescored_high_risk']:,} re-scored high risk, {summary['rescored_changes']:,}"
+                   " differ from the workbook level (rescored_risk_level column)")
 
     # Risk level pie chart
     st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">Risk Level Distribution</h2>', unsafe_allow_html=True)
-    fig1 = px.pie(df, names="current_risk_level", title="Borrower Risk Categories")
+    fig1 = risk_level_figure(summary["risk_level_counts"], summary["version"])
     st.plotly_chart(fig1, use_container_width=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
     # Top risky borrowers table
     st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">🔍 High Risk Borrowers</h2>', unsafe_allow_html=True)
-    risky = df[df["current_risk_level"] == "High"].sort_values(by="repayment_history_score")
-    st.dataframe(risky.head(10), use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        risky_page_size = st.selectbox("Rows per page", PAGE_SIZES, key="risky_page_size")
+    with col2:
+        risky_page = st.number_input("Page (lowest repayment score first)", min_value=1, value=1, step=1,
+                                     key="risky_page")
+    borrowers_dataset = (BORROWER_SHEET, version)
+    risky, total, n_pages = paginate(df, borrowers_dataset, risky_page, risky_page_size,
+                                     filters=[("current_risk_level", "High")],
+                                     sort_by="repayment_history_score")
+    st.dataframe(risky, use_container_width=True)
+    st.caption(f"Page {min(risky_page, n_pages)} of {n_pages} · {total:,} high risk borrowers")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    # Applicant drift against the model's training data
+    st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">📡 Applicant Drift</h2>', unsafe_allow_html=True)
+    drift = drift_report()
+    features = drift["features"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Applications Monitored", f"{drift['applications']:,}")
+    col2.metric("PD Score PSI", f"{features.loc[features['feature'] == 'pd_score', 'psi'].iloc[0]:.3f}")
+    col3.metric("Features Drifting", int((features["psi"] >= PSI_MODERATE).sum()))
+    st.dataframe(features.rename(columns={"feature": "Feature", "psi": "PSI", "ks": "KS", "status": "Status"}),
+                 hide_index=True, use_container_width=True)
+    st.caption(f"Applications scored in the app and through the scoring API, compared with the "
+               f"{drift['baseline_rows']:,} training loans. "
+               "PSI above 0.1 suggests moderate drift, above 0.25 significant drift.")
     st.markdown("</div>", unsafe_allow_html=True)
 
     
@@ -554,15 +625,20 @@ def application_screening_tab():
     </div>
     """, unsafe_allow_html=True)
 
-    # Load model
-    model_bundle = joblib.load("credit_risk_gb_model.pkl")
-    model = model_bundle["model"]
-    scaler = model_bundle["scaler"]
-    label_encoders = model_bundle["label_encoders"]
-    
+    from charts import contribution_figure, sensitivity_figure
+    from db import application_row, application_rows, record_applications
+    from drift import record_scored
+    from explain import annotate, explain_applicant, global_importances
+    from model_registry import get_model_bundle
+    from scoring import FEATURES, read_upload, score_applicant, score_batches
+    from sensitivity import REPAYMENT_PERIODS, best_structure, largest_approvable, sweep
+
+    # Load model (process-wide, reloaded only when the file changes)
+    model_bundle = get_model_bundle()
 
     # Input form
     with st.form("screening_form"):
+        applicant_name = st.text_input("Applicant Name")
         col1, col2 = st.columns(2)
         with col1:
             age = st.number_input("Age", 18, 70, value=30)
@@ -586,64 +662,37 @@ def application_screening_tab():
         submitted = st.form_submit_button("🧠 Predict Risk")
 
         if submitted:
-            input_dict = {
+            applicant = {
                 "age": age,
-                "gender": label_encoders["gender"].transform([gender])[0],
-                "marital_status": label_encoders["marital_status"].transform([marital_status])[0],
-                "employment_type": label_encoders["employment_type"].transform([employment_type])[0],
+                "gender": gender,
+                "marital_status": marital_status,
+                "employment_type": employment_type,
                 "monthly_income_usd": monthly_income,
                 "number_of_dependents": number_of_dependents,
-                "education_level": label_encoders["education_level"].transform([education_level])[0],
+                "education_level": education_level,
                 "loan_amount_usd": loan_amount_usd,
-                "loan_type": label_encoders["loan_type"].transform([loan_type])[0],
+                "loan_type": loan_type,
                 "repayment_period_months": repayment_period,
                 "interest_rate_percent": interest_rate,
-                "purpose_of_loan": label_encoders["purpose_of_loan"].transform([purpose])[0],
-                "residential_area_type": label_encoders["residential_area_type"].transform([area_type])[0],
-                "sector_of_activity": label_encoders["sector_of_activity"].transform([sector])[0]
+                "purpose_of_loan": purpose,
+                "residential_area_type": area_type,
+                "sector_of_activity": sector
             }
 
-            input_array = scaler.transform([list(input_dict.values())])
-            model_pred = model.predict(input_array)[0]
-            pd_score = model.predict_proba(input_array)[0][1]  # Probability of default (class 1)
-
-            # Rule-based assessment
-            rule_flags = []
-            critical_violations = 0
-
-            # Rule 1: Age extremes
-            if age < 21 or age > 60:
-                rule_flags.append("Age is outside the preferred lending bracket (21–60)")
-                critical_violations += 1
-
-            # Rule 2: High number of dependents
-            if number_of_dependents > 3:
-                rule_flags.append("More than 3 dependents may strain income")
-                critical_violations += 1
-
-            # Rule 3: Income-to-loan ratio
-            monthly_instalment_est = (loan_amount_usd * (1 + (interest_rate / 100))) / repayment_period
-            if monthly_instalment_est > 0.4 * monthly_income:
-                rule_flags.append(f"Loan burden ({monthly_instalment_est:.2f}) exceeds 40% of monthly income ({monthly_income:.2f})")
-                critical_violations += 1
-
-            # Rule 4: Very low income
-            if monthly_income < 80:
-                rule_flags.append("Monthly income is below sustainable threshold ($80)")
-                critical_violations += 1
-
-            # Rule 5: Unemployed applicants
-            if employment_type == "Unemployed":
-                rule_flags.append("Unemployment increases risk of default")
-                critical_violations += 1
-
-            # Final logic: Override model if 2+ critical rules triggered
-            if critical_violations >= 2:
-                final_prediction = 1
-                overridden = True
-            else:
-                final_prediction = model_pred
-                overridden = False
+            # Kept for the what-if sweep below the form
+            st.session_state["last_applicant"] = applicant
+
+            # Model PD plus rule-based assessment (2+ critical rules override the model)
+            result = score_applicant(applicant, model_bundle)
+            pd_score = result["pd_score"]
+            final_prediction = result["final_prediction"]
+            rule_flags = result["rule_flags"]
+            overridden = result["overridden"]
+
+            # Persist the decision (queued, committed in the background)
+            record_applications([application_row(applicant, result, st.session_state.get("username"),
+                                                 applicant_name or None)])
+            record_scored([{**applicant, "pd_score": pd_score}])
 
             # Display results
             risk_label = "✅ Low Risk" if final_prediction == 0 else "⚠️ High Risk"
@@ -658,24 +707,83 @@ def application_screening_tab():
             if overridden:
                 st.markdown("🔁 *Model risk prediction overridden based on multiple high-risk flags*")
 
+            with st.expander("🔍 Why this score?"):
+                explanation = explain_applicant(applicant, model_bundle)
+                st.plotly_chart(contribution_figure(explanation["contributions"]), use_container_width=True)
+                drivers = ", ".join(global_importances().head(3).index)
+                st.caption(f"Bars show how each input moved this applicant's model score. "
+                           f"Across the loan book the strongest drivers are {drivers}.")
+
+    # What-if sweep over loan structures for the last assessed applicant
+    last_applicant = st.session_state.get("last_applicant")
+    if last_applicant is not None:
+        st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">🔀 What-if Sensitivity</h2>',
+                    unsafe_allow_html=True)
+        if st.toggle("Sweep loan amount, repayment period and interest rate", key="sensitivity_mode"):
+            grid = sweep(last_applicant, model_bundle)
+            best = best_structure(grid)
+            if best is None:
+                st.error(f"No approvable structure among {len(grid):,} variants for this applicant.")
+            else:
+                st.success(f"Largest approvable amount: **${best['loan_amount_usd']:,.0f}** over "
+                           f"{int(best['repayment_period_months'])} month(s) at "
+                           f"{best['interest_rate_percent']:.1f}% (PD {best['pd_score']:.2%})")
+            period = st.selectbox("Repayment period for the heatmap (months)", REPAYMENT_PERIODS,
+                                  key="sensitivity_period")
+            st.plotly_chart(sensitivity_figure(grid, period), use_container_width=True)
+            st.caption(f"{len(grid):,} loan structures scored in one batch. Largest approvable amount "
+                       "by interest rate (rows) and repayment period (columns):")
+            st.dataframe(largest_approvable(grid), use_container_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # Bulk scoring
+    st.markdown('<div class="custom-card"><h2 style="color:#4b6cb7;">📂 Bulk Screening</h2>', unsafe_allow_html=True)
+    st.caption("Upload a CSV or Excel file with one application per row, using the same columns as the "
+               "Loan_Screening_Model sheet: " + ", ".join(FEATURES))
+    uploaded = st.file_uploader("Applications file", type=["csv", "xlsx"], key="bulk_upload")
+    if uploaded is not None and st.button("🧠 Score Applications"):
+        progress = st.progress(0.0, text="Scoring applications...")
+        output = io.StringIO()
+        scored_rows = high_risk_rows = 0
+        try:
+            for i, batch in enumerate(score_batches(read_upload(uploaded), model_bundle)):
+                batch = annotate(batch, model_bundle)
+                batch.to_csv(output, header=(i == 0), index=False)
+                record_applications(application_rows(batch, st.session_state.get("username")))
+                record_scored(batch)
+                scored_rows += len(batch)
+                high_risk_rows += int((batch["final_prediction"] == 1).sum())
+                progress.progress(min(0.05 * (i + 1), 0.95), text=f"Scored {scored_rows:,} applications...")
+        except ValueError as e:
+            progress.empty()
+            st.error(f"Could not score file: {e}")
+        else:
+            progress.progress(1.0, text=f"Scored {scored_rows:,} applications")
+            st.success(f"**{scored_rows:,}** applications scored, **{high_risk_rows:,}** assessed as high risk.")
+            st.download_button("⬇️ Download Results", output.getvalue(),
+                               file_name="screening_results.csv", mime="text/csv")
+    st.markdown("</div>", unsafe_allow_html=True)
+
         
 # Main App
 def main_app():
+    send_session_cookie()
     selected_tab = sidebar()
     
-    if selected_tab == "Dashboard":
-        dashboard_tab()
-    elif selected_tab == "Application Screening":
-        application_screening_tab()
-    elif selected_tab == "Borrower Monitoring":
-        borrower_monitoring_tab()
-
-# Initialize database
+    with timed(f"page:{selected_tab}"):
+        if selected_tab == "Dashboard":
+            dashboard_tab()
+        elif selected_tab == "Application Screening":
+            application_screening_tab()
+        elif selected_tab == "Borrower Monitoring":
+            borrower_monitoring_tab()
+    export_to_file()
+
+# Initialize database (once per process)
 init_db()
 
 # Check authentication
-if 'authenticated' not in st.session_state:
-    st.session_state.authenticated = False
+restore_session()
 
 if st.session_state.authenticated:
     main_app()
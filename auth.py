@@ -0,0 +1,278 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import db
+from metrics import increment, timed
+
+# Credential checks for the login and sign-up forms.
+#
+# - Passwords are stored as salted PBKDF2-SHA256 ("pbkdf2_sha256$iterations$
+#   salt$hash"). Accounts created with the original unsalted SHA-256 hex
+#   digest still log in and are re-hashed on their first successful login.
+# - Hashing runs on a small bounded thread pool (hashlib releases the GIL
+#   inside PBKDF2), so a login storm queues on a fixed number of cores and
+#   requests beyond MAX_PENDING_HASHES are shed instead of piling up.
+# - User records are cached in memory for USER_CACHE_TTL_SECONDS, so repeat
+#   lookups and sign-up "username taken" checks skip sqlite.
+# - Failed attempts are throttled per username and per client address
+#   before any hashing is done. Failures are recorded in sqlite, so the limit
+#   is shared by every worker process.
+# - Logins hand out an opaque session token, stored (hashed) in sqlite. The
+#   browser holds it in an HttpOnly SESSION_COOKIE, set by balancer.py from a
+#   single-use grant, so a reload or a reconnect to a different worker stays
+#   signed in without the token ever appearing in a URL.
+
+PBKDF2_ITERATIONS = 200_000
+SALT_BYTES = 16
+HASH_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 2))
+MAX_PENDING_HASHES = HASH_WORKERS * 8
+HASH_TIMEOUT_SECONDS = 10.0
+
+USER_CACHE_TTL_SECONDS = 60.0
+USER_CACHE_MAX_ENTRIES = 1024
+
+SESSION_TTL_SECONDS = 12 * 3600
+REMEMBER_SESSION_TTL_SECONDS = 30 * 24 * 3600
+SESSION_TOKEN_BYTES = 32
+SESSION_COOKIE = "mfi_session"
+SESSION_GRANT_PATH = "/_mfi/session"  # answered by balancer.py
+SESSION_GRANT_TTL_SECONDS = 60.0
+# How long a worker trusts its cached view of a session; sign-outs reach the
+# other workers within this delay
+SESSION_CHECK_SECONDS = 5.0
+SESSION_CACHE_MAX_ENTRIES = 4096
+
+MAX_FAILED_ATTEMPTS = 5
+FAILED_ATTEMPT_WINDOW_SECONDS = 300.0
+# Peers whose X-Forwarded-For is believed, e.g. "127.0.0.1" for the local
+# balancer (deploy.py sets it). Anyone else could forge the header to dodge
+# the per-address throttle, so their own address is used.
+TRUSTED_PROXIES = frozenset(p.strip() for p in os.environ.get("MFI_TRUSTED_PROXIES", "").split(",") if p.strip())
+
+
+class AuthError(Exception):
+    pass
+
+
+class LoginThrottled(AuthError):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many failed attempts. Try again in {int(retry_after) + 1} seconds.")
+        self.retry_after = retry_after
+
+
+class AuthBusy(AuthError):
+    def __init__(self):
+        super().__init__("Authentication service is busy. Please try again shortly.")
+
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="auth-hash")
+_pending = threading.BoundedSemaphore(MAX_PENDING_HASHES)
+
+
+def hash_password(password, salt=None, iterations=PBKDF2_ITERATIONS):
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def _is_legacy(stored):
+    return "$" not in stored
+
+
+def check_password(password, stored):
+    if _is_legacy(stored):
+        candidate = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, stored)
+    algorithm, iterations, salt, expected = stored.split("$")
+    if algorithm != "pbkdf2_sha256":
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def _run_hashing(fn, *args):
+    # Bounded hand-off to the hashing pool; sheds load once the queue is full
+    if not _pending.acquire(blocking=False):
+        increment("auth_shed")
+        raise AuthBusy()
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    try:
+        with timed("auth_hash"):
+            return future.result(timeout=HASH_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        raise AuthBusy()
+
+
+class _RecordCache:
+    # key -> (expires_at, record or None); None caches "no such row"
+    def __init__(self, load, ttl, max_entries):
+        self.load = load
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return True, entry[1]
+        record = self.load(key)
+        with self._lock:
+            self._entries[key] = (now + self.ttl, record)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return False, record
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class _Throttle:
+    # Sliding window of failures per key ("user:..." / "ip:..."), kept in
+    # sqlite so the limit holds across worker processes. Wall-clock time,
+    # since the timestamps are compared between processes.
+    def __init__(self, max_failures, window):
+        self.max_failures = max_failures
+        self.window = window
+
+    def retry_after(self, keys):
+        now = time.time()
+        wait = 0.0
+        for count, oldest in db.recent_auth_failures(keys, now - self.window).values():
+            if count >= self.max_failures:
+                wait = max(wait, oldest + self.window - now)
+        return wait
+
+    def record_failure(self, keys):
+        db.record_auth_failures(keys, time.time())
+
+    def reset(self, key):
+        # Also prunes every key's expired failures
+        db.clear_auth_failures(key, before=time.time() - self.window)
+
+
+_users = _RecordCache(db.get_user, USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+_sessions = _RecordCache(db.get_session, SESSION_CHECK_SECONDS, SESSION_CACHE_MAX_ENTRIES)
+_throttle = _Throttle(MAX_FAILED_ATTEMPTS, FAILED_ATTEMPT_WINDOW_SECONDS)
+
+
+def client_ip(remote_ip, forwarded_for=None):
+    # Address to throttle on: the entry the trusted proxy appended to
+    # X-Forwarded-For, or the connecting peer itself
+    if forwarded_for and remote_ip in TRUSTED_PROXIES:
+        return forwarded_for.split(",")[-1].strip() or remote_ip
+    return remote_ip
+
+
+def _throttle_keys(username, client):
+    keys = [f"user:{username}"]
+    if client:
+        keys.append(f"ip:{client}")
+    return keys
+
+
+def verify_user(username, password, client=None):
+    # Returns True/False; raises LoginThrottled or AuthBusy
+    keys = _throttle_keys(username, client)
+    wait = _throttle.retry_after(keys)
+    if wait > 0:
+        increment("auth_throttled")
+        raise LoginThrottled(wait)
+
+    cached, record = _users.get(username)
+    increment("auth_user_cache_hits" if cached else "auth_user_cache_misses")
+    if record is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords
+        _run_hashing(hash_password, password)
+        ok = False
+    else:
+        ok = _run_hashing(check_password, password, record["password"])
+
+    if not ok:
+        _throttle.record_failure(keys)
+        increment("auth_failures")
+        return False
+
+    _throttle.reset(f"user:{username}")
+    if _is_legacy(record["password"]):
+        db.update_password(username, _run_hashing(hash_password, password))
+        _users.invalidate(username)
+        increment("auth_legacy_migrations")
+    return True
+
+
+def user_exists(username):
+    return _users.get(username)[1] is not None
+
+
+def add_user(username, password, email, full_name, role="credit_officer"):
+    added = db.insert_user(username, _run_hashing(hash_password, password), email, full_name, role)
+    _users.invalidate(username)
+    return added
+
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_session(username, remember=False):
+    # New opaque session token for a verified user
+    now = time.time()
+    token = secrets.token_urlsafe(SESSION_TOKEN_BYTES)
+    ttl = REMEMBER_SESSION_TTL_SECONDS if remember else SESSION_TTL_SECONDS
+    db.insert_session(_token_hash(token), username, now, now + ttl)
+    db.delete_expired_sessions(now)
+    increment("sessions_created")
+    return token
+
+
+def session_grant(token, remember=False):
+    # Single-use code the browser trades for the session cookie; the cookie
+    # outlives the browser session only with "Remember me"
+    grant = secrets.token_urlsafe(SESSION_TOKEN_BYTES)
+    max_age = REMEMBER_SESSION_TTL_SECONDS if remember else None
+    db.insert_session_grant(_token_hash(grant), token, max_age, time.time() + SESSION_GRANT_TTL_SECONDS)
+    return grant
+
+
+def redeem_session_grant(grant):
+    # (token, cookie max-age or None), or None if the grant is unknown,
+    # expired or already used
+    if not grant:
+        return None
+    return db.take_session_grant(_token_hash(grant), time.time())
+
+
+def session_user(token):
+    # Username the token was issued to, or None if it is unknown, expired or
+    # signed out
+    if not token:
+        return None
+    _, session = _sessions.get(_token_hash(token))
+    if session is None or session[1] <= time.time():
+        return None
+    return session[0]
+
+
+def end_session(token):
+    if token:
+        token_hash = _token_hash(token)
+        db.delete_session(token_hash)
+        _sessions.invalidate(token_hash)
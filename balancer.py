@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import itertools
+import time
+from urllib.parse import urlsplit
+
+from auth import SESSION_COOKIE, SESSION_GRANT_PATH, redeem_session_grant
+
+# Local load balancer for the multi-worker deployment (see deploy.py).
+#
+# New connections go round-robin to the backends. Streamlit keeps a browser
+# session (and its uploaded files) inside the worker serving it, so an
+# AFFINITY_COOKIE on the first request pins the browser to its worker, and
+# the first response on an unpinned connection sets the cookie. Every
+# request head on a keep-alive connection is parsed and gets X-Forwarded-For
+# replaced with the real peer address, which keeps per-client login
+# throttling working behind the balancer; bodies are forwarded as framed by
+# Content-Length or chunked encoding, and responses are piped through as
+# they are. A websocket upgrade is only accepted as the first request, and
+# the connection becomes a raw pipe only once the backend has answered 101.
+# Unreachable backends are skipped for DOWN_SECONDS.
+#
+# The balancer also answers POST SESSION_GRANT_PATH itself, whether it is the
+# first request on a connection or a later one on a reused keep-alive
+# connection: after a login the app has the browser send the single-use grant
+# there, and the response sets the HttpOnly session cookie that every worker
+# reads (see auth.py).
+
+AFFINITY_COOKIE = "mfi_worker"
+MAX_HEADER_BYTES = 64 * 1024
+HEADER_TIMEOUT_SECONDS = 10.0
+READ_BYTES = 64 * 1024
+DOWN_SECONDS = 2.0
+MAX_GRANT_BYTES = 1024
+
+BAD_GATEWAY = (b"HTTP/1.1 502 Bad Gateway\r\nContent-Type: text/plain\r\n"
+               b"Content-Length: 24\r\nConnection: close\r\n\r\nNo backend is available\n")
+FORBIDDEN = b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def parse_backend(value):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _header(headers, wanted):
+    # Value of the first header named `wanted` (lower-case bytes), or None
+    for line in headers:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == wanted:
+            return value.strip()
+    return None
+
+
+def _is_grant(request_line):
+    return request_line.split(b" ")[:2] == [b"POST", SESSION_GRANT_PATH.encode()]
+
+
+def _same_origin(headers):
+    # Browsers send Origin on POSTs; a foreign one must not plant a session
+    origin = _header(headers, b"origin")
+    return origin is None or urlsplit(origin.decode("latin-1")).netloc.encode("latin-1") == _header(headers, b"host")
+
+
+def _session_cookie(token, max_age):
+    cookie = f"{SESSION_COOKIE}={token}; Path=/; HttpOnly; SameSite=Lax"
+    return cookie + (f"; Max-Age={int(max_age)}" if max_age else "")
+
+
+async def _grant_session(reader, writer, headers):
+    # Trades a login's single-use grant for the HttpOnly session cookie
+    try:
+        length = int(_header(headers, b"content-length") or 0)
+        grant = None
+        if 0 < length <= MAX_GRANT_BYTES and _same_origin(headers):
+            grant = (await reader.readexactly(length)).decode("ascii", "replace").strip()
+        redeemed = await asyncio.to_thread(redeem_session_grant, grant)
+        if redeemed is None:
+            writer.write(FORBIDDEN)
+        else:
+            writer.write(f"HTTP/1.1 204 No Content\r\nSet-Cookie: {_session_cookie(*redeemed)}\r\n"
+                         "Cache-Control: no-store\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        _close(writer)
+
+
+def _affinity(headers):
+    # Backend index from the affinity cookie, or None
+    for line in headers:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() != b"cookie":
+            continue
+        for cookie in value.split(b";"):
+            key, _, index = cookie.strip().partition(b"=")
+            if key == AFFINITY_COOKIE.encode() and index.isdigit():
+                return int(index)
+    return None
+
+
+def _forwarded_head(request_line, headers, peer):
+    # Request head with X-Forwarded-For set to the connecting address
+    kept = [line for line in headers if line.partition(b":")[0].strip().lower() != b"x-forwarded-for"]
+    return b"\r\n".join([request_line, *kept, b"X-Forwarded-For: " + peer.encode(), b"", b""])
+
+
+def _with_cookie(response, index):
+    # Adds the affinity cookie after the status line of an HTTP response
+    if not response.startswith(b"HTTP/1."):
+        return response
+    end = response.find(b"\r\n")
+    if end < 0:
+        return response
+    cookie = f"Set-Cookie: {AFFINITY_COOKIE}={index}; Path=/; HttpOnly; SameSite=Lax\r\n".encode()
+    return response[:end + 2] + cookie + response[end + 2:]
+
+
+async def _copy_exact(reader, writer, length):
+    while length > 0:
+        data = await reader.read(min(length, READ_BYTES))
+        if not data:
+            raise asyncio.IncompleteReadError(b"", length)
+        writer.write(data)
+        await writer.drain()
+        length -= len(data)
+
+
+async def _copy_body(reader, writer, headers):
+    # Forwards exactly one request body, so the next request head is found
+    if b"chunked" not in (_header(headers, b"transfer-encoding") or b"").lower():
+        await _copy_exact(reader, writer, int(_header(headers, b"content-length") or 0))
+        return
+    while True:
+        size_line = await reader.readuntil(b"\r\n")
+        writer.write(size_line)
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        await _copy_exact(reader, writer, size + 2)  # chunk data and its CRLF
+    while True:  # trailers, up to the blank line
+        line = await reader.readuntil(b"\r\n")
+        writer.write(line)
+        if line == b"\r\n":
+            return
+
+
+async def _forward_requests(reader, writer, client_writer, request_line, headers, peer, upgrade):
+    # Client -> backend: rewrites each request head; `upgrade` resolves to
+    # whether the backend accepted a websocket upgrade in the first request
+    try:
+        while True:
+            if _is_grant(request_line):
+                # Browsers do not pipeline, so the backend has already
+                # answered everything sent before; the grant response closes
+                # the connection
+                await _grant_session(reader, client_writer, headers)
+                _close(writer)
+                return
+            is_upgrade = _header(headers, b"upgrade") is not None
+            if is_upgrade and upgrade is None:
+                return  # upgrades only as the first request on a connection
+            writer.write(_forwarded_head(request_line, headers, peer))
+            await _copy_body(reader, writer, headers)
+            await writer.drain()
+            if is_upgrade and await upgrade:
+                await _pipe(reader, writer)  # websocket frames from here on
+                return
+            upgrade = None
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *headers = head[:-4].split(b"\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+        pass
+    finally:
+        if not writer.is_closing() and writer.can_write_eof():
+            try:
+                writer.write_eof()
+            except OSError:
+                pass
+
+
+async def _pipe(reader, writer, first_chunk=None):
+    # Copies until EOF, then passes the half-close on
+    try:
+        data = await reader.read(READ_BYTES)
+        if data and first_chunk is not None:
+            data = first_chunk(data)
+        while data:
+            writer.write(data)
+            await writer.drain()
+            data = await reader.read(READ_BYTES)
+        if writer.can_write_eof():
+            writer.write_eof()
+    except (ConnectionError, OSError):
+        pass
+
+
+def _close(writer):
+    if not writer.is_closing():
+        writer.close()
+
+
+class Balancer:
+    def __init__(self, backends, affinity=True):
+        self.backends = list(backends)
+        self.affinity = affinity
+        self.active = [0] * len(self.backends)
+        self.served = [0] * len(self.backends)
+        self._down_until = [0.0] * len(self.backends)
+        self._turn = itertools.count()
+
+    def _candidates(self, pinned):
+        # Pinned backend first, else the next in turn; down backends last
+        n = len(self.backends)
+        start = pinned if pinned is not None and 0 <= pinned < n else next(self._turn) % n
+        order = [(start + i) % n for i in range(n)]
+        now = time.monotonic()
+        return sorted(order, key=lambda i: self._down_until[i] > now)
+
+    async def _connect(self, pinned):
+        for index in self._candidates(pinned):
+            host, port = self.backends[index]
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                self._down_until[index] = time.monotonic() + DOWN_SECONDS
+                continue
+            return index, reader, writer
+        return None, None, None
+
+    async def handle(self, client_reader, client_writer):
+        peer = client_writer.get_extra_info("peername")
+        try:
+            head = await asyncio.wait_for(client_reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT_SECONDS)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            _close(client_writer)
+            return
+
+        request_line, *headers = head[:-4].split(b"\r\n")
+        if _is_grant(request_line):
+            await _grant_session(client_reader, client_writer, headers)
+            return
+        pinned = _affinity(headers) if self.affinity else None
+        index, backend_reader, backend_writer = await self._connect(pinned)
+        if index is None:
+            client_writer.write(BAD_GATEWAY)
+            _close(client_writer)
+            return
+
+        self.active[index] += 1
+        self.served[index] += 1
+        upgrade = None
+        if _header(headers, b"upgrade") is not None:
+            upgrade = asyncio.get_running_loop().create_future()
+        set_cookie = self.affinity and pinned != index
+
+        def first_response(data):
+            if upgrade is not None and not upgrade.done():
+                upgrade.set_result(data.startswith(b"HTTP/1.1 101"))
+            return _with_cookie(data, index) if set_cookie else data
+
+        try:
+            # The connection ends when the backend side does
+            upstream = asyncio.ensure_future(_forward_requests(
+                client_reader, backend_writer, client_writer, request_line, headers, peer[0] if peer else "unknown",
+                upgrade))
+            await _pipe(backend_reader, client_writer, first_response)
+            upstream.cancel()
+        finally:
+            self.active[index] -= 1
+            _close(backend_writer)
+            _close(client_writer)
+
+    def stats(self):
+        return [{"backend": f"{host}:{port}", "active": active, "served": served}
+                for (host, port), active, served in zip(self.backends, self.active, self.served)]
+
+
+async def start(host, port, backends, affinity=True):
+    balancer = Balancer(backends, affinity)
+    server = await asyncio.start_server(balancer.handle, host, port, limit=MAX_HEADER_BYTES)
+    return balancer, server
+
+
+async def serve(host, port, backends, affinity=True):
+    _, server = await start(host, port, backends, affinity)
+    print(f"Balancing http://{host}:{port} over {', '.join(f'{h}:{p}' for h, p in backends)}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin TCP load balancer with cookie affinity")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--backend", action="append", type=parse_backend, required=True,
+                        help="host:port of a worker; repeat for each worker")
+    parser.add_argument("--no-affinity", action="store_true",
+                        help="Plain round-robin for stateless backends such as the scoring API")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.backend, not args.no_affinity))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import BORROWER_SHEET, LOAN_SHEET, WORKBOOK_PATH
+from model_registry import MODEL_PATH
+
+# Reproducible performance benchmarks for screening, dashboard data and the
+# sqlite helpers. Synthetic loan and borrower books are generated from the
+# workbook's own rows (resampled with a fixed seed and jittered numerics),
+# results are written as JSON, and --compare reports the change against an
+# earlier run.
+#
+#   python benchmark.py --rows 10000,100000 --output bench.json
+#   python benchmark.py --rows 10000,100000 --compare bench.json
+
+DEFAULT_ROWS = [10_000, 100_000]
+XLSX_MAX_ROWS = 100_000  # writing bigger workbooks takes longer than the benchmark
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def synthetic_sheet(base, rows, seed=0):
+    # Resample the real rows and jitter float columns so values stay inside
+    # realistic ranges without repeating exactly
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), rows)].reset_index(drop=True)
+    for column in df.columns:
+        if pd.api.types.is_float_dtype(df[column]):
+            noise = rng.normal(1.0, 0.05, rows)
+            df[column] = (df[column] * noise).round(2)
+    if "borrower_id" in df.columns:
+        df["borrower_id"] = np.arange(1, rows + 1)
+    return df
+
+
+def bench_scoring(bundle, loans, single_iterations, batch_sizes):
+    from scoring import FEATURES, score_applicant, score_frame
+
+    applicants = loans[FEATURES].head(single_iterations).to_dict("records")
+    score_applicant(applicants[0], bundle)  # warm-up
+    single = []
+    for applicant in applicants:
+        elapsed, _ = _timed(score_applicant, applicant, bundle)
+        single.append(elapsed)
+
+    batches = {}
+    for size in batch_sizes:
+        frame = loans.head(size)
+        samples = [_timed(score_frame, frame, bundle)[0] for _ in range(3)]
+        batches[str(size)] = {**_percentiles(samples), "rows_per_second": size / min(samples)}
+    return {"single_row": _percentiles(single), "batch": batches}
+
+
+def bench_data_loading(workdir, loans, borrowers, rows):
+    import data_store
+    import ingest
+
+    results = {}
+    if rows <= XLSX_MAX_ROWS:
+        workbook = os.path.join(workdir, f"book-{rows}.xlsx")
+        with pd.ExcelWriter(workbook) as writer:
+            loans.to_excel(writer, sheet_name=LOAN_SHEET, index=False)
+            borrowers.to_excel(writer, sheet_name=BORROWER_SHEET, index=False)
+        results["read_excel_s"], _ = _timed(pd.read_excel, workbook, sheet_name=LOAN_SHEET)
+        cache_dir, data_store.CACHE_DIR = data_store.CACHE_DIR, os.path.join(workdir, "cache")
+        try:
+            results["cache_build_s"], _ = _timed(data_store.sheet_cache_path, LOAN_SHEET, workbook)
+            data_store._frames.clear()
+            results["cache_load_s"], _ = _timed(data_store.load_sheet, LOAN_SHEET, workbook)
+            results["cache_hit_s"], _ = _timed(data_store.load_sheet, LOAN_SHEET, workbook)
+        finally:
+            data_store.CACHE_DIR = cache_dir
+
+    parquet = os.path.join(workdir, f"loans-{rows}.parquet")
+    loans.to_parquet(parquet)
+    results["stream_kpis_parquet_s"], _ = _timed(ingest.summarize, parquet, ingest.LoanSummary())
+    feather_path = os.path.join(workdir, f"loans-{rows}.feather")
+    loans.to_feather(feather_path)
+    results["stream_kpis_feather_s"], _ = _timed(ingest.summarize, feather_path, ingest.LoanSummary())
+    borrower_parquet = os.path.join(workdir, f"borrowers-{rows}.parquet")
+    borrowers.to_parquet(borrower_parquet)
+    results["stream_borrower_summary_s"], _ = _timed(
+        ingest.summarize, borrower_parquet, ingest.BorrowerSummary())
+
+    def dataframe_kpis():
+        # The dashboard's original full-frame KPI computation, for reference
+        total = len(loans)
+        approved = loans[loans["default_status"] == 0]
+        return (round(len(approved) / total * 100, 1), round(loans["loan_amount_usd"].mean(), 2),
+                len(loans[loans["default_status"] == 1]), loans["purpose_of_loan"].value_counts())
+    results["dataframe_kpis_s"], _ = _timed(dataframe_kpis)
+    return results
+
+
+def bench_auth(workdir, threads, logins_per_thread):
+    import auth
+    import db
+
+    previous = os.getcwd()
+    os.chdir(workdir)  # db helpers use a relative database path
+    try:
+        db.init_db()
+        for i in range(threads):
+            auth.add_user(f"officer{i}", "correct horse", f"officer{i}@example.com", f"Officer {i}")
+
+        latencies = [[] for _ in range(threads)]
+
+        def worker(i):
+            for _ in range(logins_per_thread):
+                elapsed, ok = _timed(auth.verify_user, f"officer{i}", "correct horse")
+                assert ok
+                latencies[i].append(elapsed)
+
+        start = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        db.close_all()
+    finally:
+        os.chdir(previous)
+
+    total = threads * logins_per_thread
+    return {
+        "threads": threads,
+        "logins": total,
+        "logins_per_second": total / elapsed,
+        "latency": _percentiles([x for per_thread in latencies for x in per_thread]),
+    }
+
+
+def run(rows_list, seed, single_iterations, auth_threads, auth_logins):
+    from model_registry import get_model_bundle
+
+    base_loans = pd.read_excel(WORKBOOK_PATH, sheet_name=LOAN_SHEET, keep_default_na=False, na_values=[""])
+    base_borrowers = pd.read_excel(WORKBOOK_PATH, sheet_name=BORROWER_SHEET)
+    model_load_s, bundle = _timed(get_model_bundle, os.path.abspath(MODEL_PATH))
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": seed,
+        },
+        "model_load_s": model_load_s,
+        "sizes": {},
+    }
+
+    workdir = tempfile.mkdtemp(prefix="mfi-bench-")
+    try:
+        for rows in rows_list:
+            loans = synthetic_sheet(base_loans, rows, seed)
+            borrowers = synthetic_sheet(base_borrowers, rows, seed + 1)
+            batch_sizes = sorted({min(rows, n) for n in (1_000, 10_000, rows)})
+            size_results = {
+                "scoring": bench_scoring(bundle, loans, single_iterations, batch_sizes),
+                "data": bench_data_loading(workdir, loans, borrowers, rows),
+                "peak_rss_bytes": _peak_rss_bytes(),
+            }
+            results["sizes"][str(rows)] = size_results
+            print(f"{rows:>10,} rows: single p50 {size_results['scoring']['single_row']['p50_ms']:.2f} ms, "
+                  f"batch {size_results['scoring']['batch'][str(batch_sizes[-1])]['rows_per_second']:,.0f} rows/s")
+        results["auth"] = bench_auth(workdir, auth_threads, auth_logins)
+        print(f"verify_user: {results['auth']['logins_per_second']:,.0f} logins/s "
+              f"with {auth_threads} threads")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results["peak_rss_bytes"] = _peak_rss_bytes()
+    return results
+
+
+def _flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline):
+    # Relative change per metric present in both runs
+    now, before = _flatten(current), _flatten(baseline)
+    rows = []
+    for key in sorted(now.keys() & before.keys()):
+        if key.startswith("meta.") or not before[key]:
+            continue
+        rows.append((key, before[key], now[key], (now[key] - before[key]) / before[key] * 100))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MFI credit risk performance benchmarks")
+    parser.add_argument("--rows", default=",".join(str(r) for r in DEFAULT_ROWS),
+                        help="Comma-separated synthetic book sizes (10k to 10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--single-iterations", type=int, default=500)
+    parser.add_argument("--auth-threads", type=int, default=8)
+    parser.add_argument("--auth-logins", type=int, default=20, help="verify_user calls per thread")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    rows_list = [int(r) for r in args.rows.split(",") if r]
+    results = run(rows_list, args.seed, args.single_iterations, args.auth_threads, args.auth_logins)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key, before, now, change in compare(results, baseline):
+            print(f"{key:<60} {before:>14.4f} {now:>14.4f} {change:>+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
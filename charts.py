@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from metrics import timed
+from result_cache import cache
+
+# Above this many loans the Income vs Loan Amount chart is aggregated on the
+# server instead of shipping every point to the browser
+SCATTER_MAX_POINTS = 5000
+SCATTER_BINS = 60
+STATUS_LABELS = {0: "Approved", 1: "Defaulted"}
+
+
+def _binned_points(df, bins):
+    # 2D histogram per default status; each non-empty cell becomes one
+    # marker at the cell centre, sized by its loan count
+    x = df["monthly_income_usd"].to_numpy(dtype=float)
+    y = df["loan_amount_usd"].to_numpy(dtype=float)
+    x_edges = np.linspace(np.nanmin(x), np.nanmax(x), bins + 1)
+    y_edges = np.linspace(np.nanmin(y), np.nanmax(y), bins + 1)
+    x_centres = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centres = (y_edges[:-1] + y_edges[1:]) / 2
+
+    frames = []
+    status = df["default_status"].to_numpy()
+    for code, label in STATUS_LABELS.items():
+        mask = status == code
+        counts, _, _ = np.histogram2d(x[mask], y[mask], bins=[x_edges, y_edges])
+        xi, yi = np.nonzero(counts)
+        frames.append(pd.DataFrame({
+            "monthly_income_usd": x_centres[xi],
+            "loan_amount_usd": y_centres[yi],
+            "Status": label,
+            "Loans": counts[xi, yi].astype(int),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _stratified_sample(df, max_points, seed=0):
+    # Same share of each default status as the full portfolio
+    fraction = max_points / len(df)
+    return df.groupby("default_status").sample(frac=fraction, random_state=seed)
+
+
+def income_loan_figure(df, version, max_points=SCATTER_MAX_POINTS, mode="bins", bins=SCATTER_BINS):
+    if len(df) <= max_points:
+        mode = "points"
+    return cache.get_or_compute("loan_figures", version, ("income_loan", mode, max_points, bins),
+                                lambda: _income_loan_figure(df, max_points, mode, bins))
+
+
+def _income_loan_figure(df, max_points, mode, bins):
+    with timed("chart_build"):
+        return _build_income_loan_figure(df, max_points, mode, bins)
+
+
+def _build_income_loan_figure(df, max_points, mode, bins):
+    if mode == "points":
+        fig = px.scatter(df, x="monthly_income_usd", y="loan_amount_usd",
+                         color=df["default_status"].map(STATUS_LABELS),
+                         labels={"color": "Status"})
+    elif mode == "bins":
+        points = _binned_points(df, bins)
+        fig = px.scatter(points, x="monthly_income_usd", y="loan_amount_usd",
+                         color="Status", size="Loans", hover_data=["Loans"],
+                         labels={"Status": "Status"})
+    elif mode == "sample":
+        sample = _stratified_sample(df, max_points)
+        fig = px.scatter(sample, x="monthly_income_usd", y="loan_amount_usd",
+                         color=sample["default_status"].map(STATUS_LABELS),
+                         labels={"color": "Status"})
+    else:
+        raise ValueError(f"Unknown scatter mode: {mode}")
+
+    if mode != "points":
+        fig.update_layout(title_text=f"{len(df):,} loans ({'binned' if mode == 'bins' else 'sampled'})",
+                          title_font_size=12)
+    return fig
+
+
+def purpose_figure(purpose_counts, version):
+    def build():
+        with timed("chart_build"):
+            purpose_data = pd.DataFrame(list(purpose_counts.items()), columns=["Purpose", "Count"])
+            return px.pie(purpose_data, values="Count", names="Purpose", hole=0.4)
+    return cache.get_or_compute("loan_figures", version, "purpose", build)
+
+
+def contribution_figure(contributions, top=8):
+    # Per-applicant explanation; not cached since every applicant differs
+    with timed("chart_build"):
+        data = pd.DataFrame(list(contributions.items()), columns=["Feature", "Contribution"])
+        data = data.reindex(data["Contribution"].abs().sort_values(ascending=False).index).head(top)
+        data["Effect"] = np.where(data["Contribution"] > 0, "Raises PD", "Lowers PD")
+        fig = px.bar(data.iloc[::-1], x="Contribution", y="Feature", color="Effect", orientation="h",
+                     color_discrete_map={"Raises PD": "#E53935", "Lowers PD": "#43A047"},
+                     labels={"Contribution": "Contribution (log-odds of default)", "Feature": ""})
+        fig.update_layout(height=320, margin={"t": 10, "b": 10})
+        return fig
+
+
+def sensitivity_figure(result, repayment_period):
+    # PD heatmap over loan amount x interest rate for one repayment period
+    with timed("chart_build"):
+        rows = result[result["repayment_period_months"] == repayment_period]
+        grid = rows.pivot_table(index="interest_rate_percent", columns="loan_amount_usd", values="pd_score")
+        fig = px.imshow(grid, origin="lower", aspect="auto", color_continuous_scale="RdYlGn_r",
+                        zmin=0, zmax=1, labels={"x": "Loan amount (USD)", "y": "Interest rate (%)",
+                                                "color": "PD"})
+        fig.update_layout(height=360, margin={"t": 10, "b": 10})
+        return fig
+
+
+def risk_level_figure(risk_level_counts, version):
+    def build():
+        with timed("chart_build"):
+            risk_levels = pd.DataFrame(list(risk_level_counts.items()), columns=["current_risk_level", "count"])
+            return px.pie(risk_levels, names="current_risk_level", values="count",
+                          title="Borrower Risk Categories")
+    return cache.get_or_compute("borrower_figures", version, "risk_level", build)
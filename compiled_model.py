@@ -0,0 +1,262 @@
+import argparse
+import os
+
+import numpy as np
+
+# Array-backed inference for the GradientBoostingClassifier in the model
+# bundle. Every regression tree is flattened into shared node arrays
+# (feature, threshold, child pairs, leaf value) so a batch of rows is
+# scored with a fixed number of vectorized gathers, and the class and
+# probability come out of the same traversal.
+
+
+class CompiledModel:
+    # Rows are traversed in blocks so the (rows x trees) node matrix stays
+    # cache-sized for large batches
+    block_size = 4096
+    arrays = ("feature", "threshold", "children", "value", "roots", "classes", "mean", "scale")
+
+    def __init__(self, feature, threshold, children, value, roots,
+                 max_depth, init_raw, learning_rate, classes, mean, scale):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.init_raw = float(init_raw)
+        self.learning_rate = float(learning_rate)
+        self.classes = classes
+        self.mean = mean
+        self.scale = scale
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children,
+                                       self.value, self.roots, self.classes, self.mean, self.scale))
+
+    def decision_function(self, X_scaled):
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        n_rows, n_features = X.shape
+        raw = np.empty(n_rows)
+        for start in range(0, n_rows, self.block_size):
+            block = X[start:start + self.block_size]
+            flat = block.ravel()
+            row_offsets = (np.arange(block.shape[0], dtype=np.int32) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.n_trees))
+            for _ in range(self.max_depth):
+                go_right = flat.take(row_offsets + self.feature.take(nodes)) > self.threshold.take(nodes)
+                nodes = self.children.take(2 * nodes + go_right)
+            raw[start:start + self.block_size] = self.value.take(nodes).sum(axis=1)
+        return self.init_raw + self.learning_rate * raw
+
+    def contributions(self, X_encoded):
+        # Path-based (Saabas) attribution of the raw log-odds: each split
+        # credits its feature with the change in node value along the row's
+        # path. Returns (bias, rows x features); bias plus a row's sum equals
+        # its decision_function value.
+        X_scaled = (np.asarray(X_encoded, dtype=np.float64) - self.mean) / self.scale
+        X = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        n_rows, n_features = X.shape
+        contrib = np.empty((n_rows, n_features))
+        for start in range(0, n_rows, self.block_size):
+            block = X[start:start + self.block_size]
+            flat = block.ravel()
+            row_offsets = (np.arange(block.shape[0], dtype=np.int32) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.n_trees))
+            block_contrib = np.zeros(block.size)
+            for _ in range(self.max_depth):
+                cells = row_offsets + self.feature.take(nodes)
+                go_right = flat.take(cells) > self.threshold.take(nodes)
+                next_nodes = self.children.take(2 * nodes + go_right)
+                # Leaves loop back on themselves, so finished paths add zero
+                delta = self.value.take(next_nodes) - self.value.take(nodes)
+                block_contrib += np.bincount(cells.ravel(), weights=delta.ravel(), minlength=block.size)
+                nodes = next_nodes
+            contrib[start:start + self.block_size] = block_contrib.reshape(block.shape)
+        bias = self.init_raw + self.learning_rate * self.value.take(self.roots).sum()
+        return bias, self.learning_rate * contrib
+
+    def predict(self, X_encoded):
+        # Returns (class labels, probabilities) from raw encoded features
+        X_scaled = (np.asarray(X_encoded, dtype=np.float64) - self.mean) / self.scale
+        raw = self.decision_function(X_scaled)
+        p_default = 1.0 / (1.0 + np.exp(-raw))
+        proba = np.column_stack([1.0 - p_default, p_default])
+        return self.classes.take(np.argmax(proba, axis=1)), proba
+
+    def save(self, path):
+        np.savez(path, feature=self.feature, threshold=self.threshold, children=self.children,
+                 value=self.value, roots=self.roots, max_depth=self.max_depth,
+                 init_raw=self.init_raw, learning_rate=self.learning_rate,
+                 classes=self.classes, mean=self.mean, scale=self.scale)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def export(self, directory):
+        # One .npy per array, so load_shared can memory-map them
+        os.makedirs(directory, exist_ok=True)
+        for name in self.arrays:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(directory, "scalars.npy"),
+                np.array([self.max_depth, self.init_raw, self.learning_rate]))
+
+    @classmethod
+    def load_shared(cls, directory):
+        # Read-only memory maps: every process loading the same directory
+        # shares one copy of the arrays in the page cache. Plain ndarray
+        # views, since np.memmap results cost extra on every small take().
+        arrays = {name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+                  for name in cls.arrays}
+        max_depth, init_raw, learning_rate = np.load(os.path.join(directory, "scalars.npy"))
+        return cls(max_depth=max_depth, init_raw=init_raw, learning_rate=learning_rate, **arrays)
+
+
+def _expected_values(tree):
+    # Gradient boosting overwrites leaf values with Newton steps but leaves
+    # internal nodes at the mean residual, a different scale. Internal values
+    # are recomputed bottom-up as the sample-weighted mean of their children,
+    # so path deltas are true contributions and the root is the tree's
+    # expected output. Leaves (the only values predictions read) are kept.
+    value = tree.value[:, 0, 0].astype(np.float64)
+    weight = tree.weighted_n_node_samples
+    left, right = tree.children_left, tree.children_right
+    # Children always have larger ids than their parent
+    for node in range(tree.node_count - 1, -1, -1):
+        if left[node] != -1:
+            value[node] = (weight[left[node]] * value[left[node]] + weight[right[node]] * value[right[node]]) \
+                / (weight[left[node]] + weight[right[node]])
+    return value
+
+
+def compile_bundle(bundle):
+    model = bundle["model"]
+    scaler = bundle["scaler"]
+    if model.estimators_.shape[1] != 1:
+        raise ValueError("Only binary gradient boosting models can be compiled")
+
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+
+        # Leaves point back at themselves so every row can take exactly
+        # max_depth steps without branching on leaf checks. Children are
+        # interleaved so node n goes to children[2n] (left) or [2n + 1].
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, tree.threshold)
+        pairs = np.empty((tree.node_count, 2), dtype=np.int64)
+        pairs[:, 0] = np.where(is_leaf, node_ids, tree.children_left) + offset
+        pairs[:, 1] = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+        features.append(feature)
+        thresholds.append(threshold)
+        children.append(pairs.ravel())
+        values.append(_expected_values(tree))
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    # Initial raw score is the log-odds of the training prior
+    zero_row = np.zeros((1, model.n_features_in_))
+    eps = np.finfo(np.float32).eps
+    prior = np.clip(model.init_.predict_proba(zero_row)[0, 1], eps, 1 - eps)
+    init_raw = np.log(prior / (1 - prior))
+
+    return CompiledModel(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        children=np.concatenate(children).astype(np.int32),
+        value=np.concatenate(values).astype(np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        max_depth=max_depth,
+        init_raw=init_raw,
+        learning_rate=model.learning_rate,
+        classes=np.asarray(model.classes_),
+        mean=np.asarray(scaler.mean_, dtype=np.float64),
+        scale=np.asarray(scaler.scale_, dtype=np.float64),
+    )
+
+
+def check_parity(bundle, compiled, X_encoded, atol=1e-9):
+    # Compare compiled output with sklearn's predict / predict_proba
+    X_scaled = bundle["scaler"].transform(X_encoded)
+    expected_pred = bundle["model"].predict(X_scaled)
+    expected_proba = bundle["model"].predict_proba(X_scaled)
+    pred, proba = compiled.predict(np.asarray(X_encoded, dtype=np.float64))
+    mismatched = int((pred != expected_pred).sum())
+    max_error = float(np.abs(proba - expected_proba).max()) if len(proba) else 0.0
+    return {
+        "rows": len(pred),
+        "mismatched_predictions": mismatched,
+        "max_probability_error": max_error,
+        "ok": mismatched == 0 and max_error <= atol,
+    }
+
+
+def _parity_samples(bundle, n_random, seed):
+    from data_store import load_loans
+    from scoring import compile_encoders, encode_frame
+
+    encoded = encode_frame(load_loans(), compile_encoders(bundle["label_encoders"]))
+
+    # Random rows spanning each feature's observed range, plus exact
+    # split thresholds to exercise the <= boundary
+    rng = np.random.default_rng(seed)
+    low, high = encoded.min(axis=0), encoded.max(axis=0)
+    random_rows = rng.uniform(low, high, size=(n_random, encoded.shape[1]))
+    model = bundle["model"]
+    scaler = bundle["scaler"]
+    boundary_rows = []
+    for estimator in model.estimators_[:10, 0]:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left != -1):
+            row = scaler.mean_.copy()
+            row[tree.feature[node]] = tree.threshold[node] * scaler.scale_[tree.feature[node]] \
+                + scaler.mean_[tree.feature[node]]
+            boundary_rows.append(row)
+    return np.vstack([encoded, random_rows, np.asarray(boundary_rows)])
+
+
+def main():
+    import pandas as pd
+
+    from model_registry import MODEL_PATH, get_model_bundle
+    from scoring import FEATURES
+
+    parser = argparse.ArgumentParser(description="Export the model bundle as compiled tree arrays")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", default="credit_risk_gb_model.npz")
+    parser.add_argument("--random-rows", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bundle = get_model_bundle(args.model)
+    compiled = compile_bundle(bundle)
+    X = pd.DataFrame(_parity_samples(bundle, args.random_rows, args.seed), columns=FEATURES)
+    report = check_parity(bundle, compiled, X)
+    print(f"Parity over {report['rows']} rows: {report['mismatched_predictions']} mismatched predictions, "
+          f"max probability error {report['max_probability_error']:.3g}")
+    if not report["ok"]:
+        raise SystemExit("Compiled model does not match sklearn; not exporting")
+
+    compiled.save(args.output)
+    reloaded = CompiledModel.load(args.output)
+    if not check_parity(bundle, reloaded, X)["ok"]:
+        raise SystemExit("Exported arrays do not reload identically")
+    print(f"Wrote {compiled.n_trees} trees ({compiled.nbytes:,} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ingest import iter_chunks
+from metrics import timed
+
+WORKBOOK_PATH = "MFI_Credit_Risk_Data.xlsx"
+CACHE_DIR = ".data_cache"
+LOAN_SHEET = "Loan_Screening_Model"
+BORROWER_SHEET = "Borrower_Tracking_Data"
+
+# Compact column types for each sheet. Low-cardinality text is stored as
+# dictionary-encoded categoricals, small-range counts as narrow integers, and
+# rates/scores as float32. Money stays float64 so cents and running totals
+# stay exact. Integer columns are range-checked while the cache is built.
+SCHEMAS = {
+    LOAN_SHEET: {
+        "age": "int16",
+        "gender": "category",
+        "marital_status": "category",
+        "employment_type": "category",
+        "monthly_income_usd": "float64",
+        "number_of_dependents": "int8",
+        "education_level": "category",
+        "loan_amount_usd": "float64",
+        "loan_type": "category",
+        "repayment_period_months": "int16",
+        "interest_rate_percent": "float32",
+        "purpose_of_loan": "category",
+        "residential_area_type": "category",
+        "sector_of_activity": "category",
+        "default_status": "int8",
+    },
+    BORROWER_SHEET: {
+        "borrower_id": "int32",
+        "previous_loans_count": "int16",
+        "repayment_history_score": "float32",
+        "missed_payments_last_6_months": "int8",
+        "days_late_average": "float32",
+        "savings_balance_usd": "float64",
+        "mobile_money_usage": "category",
+        "group_affiliation_strength": "int8",
+        "current_risk_level": "category",
+    },
+}
+
+# Categoricals are streamed as plain strings and dictionary-encoded once the
+# whole sheet is on disk, so every row shares one dictionary
+_ARROW_TYPES = {
+    "int8": pa.int8(), "int16": pa.int16(), "int32": pa.int32(), "int64": pa.int64(),
+    "float32": pa.float32(), "float64": pa.float64(), "category": pa.string(), "object": pa.string(),
+}
+
+# Each sheet is streamed out of the workbook with openpyxl once, written as
+# an uncompressed Feather (Arrow IPC) file, and served from that file
+# afterwards. Sheets up to COMPACT_BATCH_ROWS rows are one contiguous batch;
+# longer ones are split into batches of that size so building never holds
+# the whole sheet. The cache is keyed by the workbook's content hash;
+# mtime/size only decide when to re-hash. Loaded frames are memory-mapped
+# views of a single-batch file: numeric columns are zero-copy, pages are
+# shared with every other worker process reading the same file, and the
+# arrays are read-only, so callers must copy before modifying.
+COMPACT_BATCH_ROWS = 1_000_000
+_lock = threading.Lock()
+_signatures = {}
+_frames = {}
+# One build at a time per (sheet, version) inside this process; other
+# processes build into their own temp files and the last os.replace wins
+_build_locks = {}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_version(path=WORKBOOK_PATH):
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _signatures.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    version = _file_hash(path)[:16]
+    with _lock:
+        _signatures[path] = (signature, version)
+    return version
+
+
+def _cache_path(sheet_name, version):
+    return os.path.join(CACHE_DIR, f"{sheet_name}-{version}.feather")
+
+
+def coerce_chunk(chunk, sheet_name):
+    for column, dtype in SCHEMAS.get(sheet_name, {}).items():
+        if column not in chunk.columns:
+            continue
+        if dtype in ("object", "category"):
+            # openpyxl hands back the literal "None" education level as a
+            # string; only genuinely empty cells stay missing
+            chunk[column] = chunk[column].map(lambda v: v if v is None else str(v))
+            continue
+        values = pd.to_numeric(chunk[column])
+        if dtype.startswith("int"):
+            limits = np.iinfo(dtype)
+            if values.min() < limits.min or values.max() > limits.max:
+                raise ValueError(f"{sheet_name}.{column} has values outside the {dtype} range")
+        chunk[column] = values if values.isna().any() else values.astype(dtype)
+    return chunk
+
+
+def _index_type(cardinality):
+    for index_type in (pa.int8(), pa.int16()):
+        if cardinality <= np.iinfo(index_type.to_pandas_dtype()).max:
+            return index_type
+    return pa.int32()
+
+
+def _add_categories(categories, chunk):
+    # Grows each categorical column's dictionary with values not seen yet,
+    # in order of first appearance
+    for column, values in categories.items():
+        values.update(dict.fromkeys(chunk[column].dropna().unique()))
+
+
+def _compact_schema(schema, dictionaries):
+    return pa.schema([
+        pa.field(field.name, pa.dictionary(_index_type(len(dictionaries[field.name])), pa.string()))
+        if field.name in dictionaries else field
+        for field in schema
+    ])
+
+
+def _compact_batch(batches, schema, dictionaries):
+    # Staging batches as one contiguous batch, categoricals encoded against
+    # the shared dictionaries
+    table = pa.Table.from_batches(batches).combine_chunks()
+    columns = []
+    for field, column in zip(schema, table.columns):
+        if field.name in dictionaries:
+            indices = pc.index_in(column, value_set=dictionaries[field.name]).cast(field.type.index_type)
+            column = pa.DictionaryArray.from_arrays(indices.combine_chunks(), dictionaries[field.name])
+        columns.append(column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def _compact(staging, tmp, categories):
+    # Rewrites the staging file in batches of up to COMPACT_BATCH_ROWS. Every
+    # batch shares one dictionary per categorical, and a sheet that fits in
+    # one batch stays a single contiguous batch.
+    dictionaries = {column: pa.array(list(values), pa.string()) for column, values in categories.items()}
+    with pa.memory_map(staging) as source:
+        reader = pa.ipc.open_file(source)
+        schema = _compact_schema(reader.schema, dictionaries)
+        with pa.ipc.new_file(tmp, schema) as writer:
+            pending, rows = [], 0
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                pending.append(batch)
+                rows += batch.num_rows
+                if rows >= COMPACT_BATCH_ROWS:
+                    writer.write_batch(_compact_batch(pending, schema, dictionaries))
+                    pending, rows = [], 0
+            if pending:
+                writer.write_batch(_compact_batch(pending, schema, dictionaries))
+
+
+def _arrow_schema(sheet_name, first_chunk):
+    schema = SCHEMAS.get(sheet_name)
+    if schema is None:
+        return pa.Schema.from_pandas(first_chunk, preserve_index=False)
+    fields = []
+    for column in first_chunk.columns:
+        dtype = schema.get(column)
+        if dtype is None:
+            fields.append(pa.Schema.from_pandas(first_chunk[[column]], preserve_index=False).field(0))
+        else:
+            fields.append(pa.field(column, _ARROW_TYPES[dtype]))
+    return pa.schema(fields)
+
+
+def _temp_path(target, suffix):
+    # Unique name next to the target, so concurrent builds never share a file
+    fd, temp = tempfile.mkstemp(dir=CACHE_DIR, prefix=f"{os.path.basename(target)}.", suffix=suffix)
+    os.close(fd)
+    return temp
+
+
+def _build_cache(path, sheet_name, version):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    target = _cache_path(sheet_name, version)
+    staging = _temp_path(target, ".staging")
+    tmp = _temp_path(target, ".tmp")
+
+    # Stream the sheet to a staging file, collecting the categorical
+    # dictionaries on the way, then compact it batch by batch, so memory stays
+    # bounded by one chunk while parsing and one output batch while compacting
+    writer = None
+    try:
+        for chunk in iter_chunks(path, sheet_name):
+            chunk = coerce_chunk(chunk, sheet_name)
+            if writer is None:
+                schema = _arrow_schema(sheet_name, chunk)
+                writer = pa.ipc.new_file(staging, schema)
+                categories = {column: {} for column, dtype in SCHEMAS.get(sheet_name, {}).items()
+                              if dtype == "category" and column in chunk.columns}
+            _add_categories(categories, chunk)
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        if writer is None:
+            raise ValueError(f"Sheet {sheet_name} in {path} has no header row")
+        writer.close()
+        writer = None
+
+        _compact(staging, tmp, categories)
+        os.replace(tmp, target)
+    finally:
+        if writer is not None:
+            writer.close()
+        for leftover in (staging, tmp):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    # Drop cache files left over from older workbook versions
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(f"{sheet_name}-") and name.endswith(".feather") \
+                and name != os.path.basename(target):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+    return target
+
+
+def sheet_cache_path(sheet_name, path=WORKBOOK_PATH):
+    # Feather file for the sheet's current version, built on first use
+    version = dataset_version(path)
+    target = _cache_path(sheet_name, version)
+    if os.path.exists(target):
+        return target
+    with _lock:
+        build_lock = _build_locks.setdefault((sheet_name, version), threading.Lock())
+    with build_lock:
+        if not os.path.exists(target):
+            with timed("data_cache_build"):
+                target = _build_cache(path, sheet_name, version)
+    return target
+
+
+def _read_mapped(cache_file):
+    # The mapped buffers keep the file open for as long as the frame lives
+    table = pa.ipc.open_file(pa.memory_map(cache_file)).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def load_sheet(sheet_name, path=WORKBOOK_PATH):
+    version = dataset_version(path)
+    key = (path, sheet_name, version)
+    with _lock:
+        df = _frames.get(key)
+    if df is not None:
+        return df
+
+    with timed("data_load"):
+        df = _read_mapped(sheet_cache_path(sheet_name, path))
+
+    with _lock:
+        for stale in [k for k in _frames if k[:2] == key[:2]]:
+            del _frames[stale]
+        _frames[key] = df
+    return df
+
+
+def load_loans(path=WORKBOOK_PATH):
+    return load_sheet(LOAN_SHEET, path)
+
+
+def load_borrowers(path=WORKBOOK_PATH):
+    return load_sheet(BORROWER_SHEET, path)
@@ -0,0 +1,515 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import increment, observe, timed
+
+DB_PATH = 'mfi_credit_risk.db'
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# Small process-wide pool of connections. Streamlit runs script reruns on
+# short-lived threads, so connections are pooled rather than thread-local
+# and are handed to one thread at a time.
+POOL_SIZE = 8
+_pools = {}
+_pools_lock = threading.Lock()
+_init_lock = threading.Lock()
+_initialized = set()
+
+# SQL kept as module constants so sqlite3's per-connection statement cache
+# reuses the prepared statements
+INSERT_USER = "INSERT INTO users VALUES (?, ?, ?, ?, ?, datetime('now'))"
+SELECT_USER = "SELECT username, password, email, full_name, role FROM users WHERE username = ?"
+UPDATE_USER_PASSWORD = "UPDATE users SET password = ? WHERE username = ?"
+UPDATE_APPLICATION_OUTCOME = "UPDATE applications SET default_status = ? WHERE id = ?"
+
+# Login sessions and failed-login records, shared by every worker process
+INSERT_SESSION = "INSERT INTO sessions (token_hash, username, created_at, expires_at) VALUES (?, ?, ?, ?)"
+SELECT_SESSION = "SELECT username, expires_at FROM sessions WHERE token_hash = ?"
+DELETE_SESSION = "DELETE FROM sessions WHERE token_hash = ?"
+DELETE_EXPIRED_SESSIONS = "DELETE FROM sessions WHERE expires_at <= ?"
+INSERT_SESSION_GRANT = "INSERT INTO session_grants (grant_hash, token, max_age, expires_at) VALUES (?, ?, ?, ?)"
+TAKE_SESSION_GRANT = "DELETE FROM session_grants WHERE grant_hash = ? RETURNING token, max_age, expires_at"
+DELETE_EXPIRED_SESSION_GRANTS = "DELETE FROM session_grants WHERE expires_at <= ?"
+INSERT_AUTH_FAILURE = "INSERT INTO auth_failures (key, failed_at) VALUES (?, ?)"
+DELETE_AUTH_FAILURES = "DELETE FROM auth_failures WHERE key = ?"
+DELETE_OLD_AUTH_FAILURES = "DELETE FROM auth_failures WHERE failed_at <= ?"
+
+# Drift monitoring: per-bin counts of scored applications, added to by every
+# worker process (drift.py)
+ADD_DRIFT_COUNT = """
+    INSERT INTO drift_counts (version, feature, bin, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT(version, feature, bin) DO UPDATE SET count = count + excluded.count
+"""
+SELECT_DRIFT_COUNTS = "SELECT feature, bin, count FROM drift_counts WHERE version = ?"
+
+APPLICATION_EXTRA_COLUMNS = [
+    ("number_of_dependents", "INTEGER"),
+    ("education_level", "TEXT"),
+    ("repayment_period_months", "INTEGER"),
+    ("interest_rate_percent", "REAL"),
+    ("residential_area_type", "TEXT"),
+    ("sector_of_activity", "TEXT"),
+    ("model_prediction", "INTEGER"),
+    ("critical_violations", "INTEGER"),
+    ("overridden", "INTEGER"),
+    ("rule_flags", "TEXT"),
+]
+
+APPLICATION_COLUMNS = [
+    "applicant_name", "age", "gender", "marital_status", "employment_type",
+    "monthly_income", "loan_amount", "loan_type", "purpose",
+    "risk_score", "risk_category", "decision", "officer_username", "created_at",
+] + [column for column, _ in APPLICATION_EXTRA_COLUMNS]
+
+INSERT_APPLICATION = (
+    f"INSERT INTO applications ({', '.join(APPLICATION_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in APPLICATION_COLUMNS)})"
+)
+
+# Applications table columns renamed to the model's feature names
+APPLICATION_FEATURES = {
+    "age": "age",
+    "gender": "gender",
+    "marital_status": "marital_status",
+    "employment_type": "employment_type",
+    "monthly_income": "monthly_income_usd",
+    "number_of_dependents": "number_of_dependents",
+    "education_level": "education_level",
+    "loan_amount": "loan_amount_usd",
+    "loan_type": "loan_type",
+    "repayment_period_months": "repayment_period_months",
+    "interest_rate_percent": "interest_rate_percent",
+    "purpose": "purpose_of_loan",
+    "residential_area_type": "residential_area_type",
+    "sector_of_activity": "sector_of_activity",
+}
+
+# Write-behind queue for screening decisions: the UI only enqueues, and a
+# daemon thread commits whatever has accumulated in one transaction
+WRITE_BATCH_SIZE = 500
+WRITE_INTERVAL_SECONDS = 0.5
+# A batch that fails with a (usually transient) OperationalError, e.g. the
+# database staying locked past the busy timeout, is retried with doubling
+# delays; after the last attempt, or on any other error, its rows are
+# logged and dropped
+WRITE_ATTEMPTS = 5
+WRITE_RETRY_SECONDS = 0.1
+# Rows waiting to be written; when the writer falls this far behind, submit
+# waits up to WRITE_QUEUE_TIMEOUT_SECONDS for room and then logs and drops
+WRITE_QUEUE_ROWS = 100_000
+WRITE_QUEUE_TIMEOUT_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, cached_statements=256,
+                           check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_SECONDS * 1000)}")
+    return conn
+
+
+def _pool(path):
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return pool
+
+
+@contextmanager
+def connection(path=DB_PATH):
+    # Time from checkout to return is recorded as the "db" latency
+    start = time.perf_counter()
+    pool = _pool(path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect(path)
+        increment("db_connections_opened")
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        observe("db", time.perf_counter() - start)
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def close_all(path=DB_PATH):
+    pool = _pool(path)
+    while True:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+def init_db(path=DB_PATH):
+    # Schema setup runs once per process, not on every script rerun
+    if path in _initialized:
+        return
+    with _init_lock:
+        if path in _initialized:
+            return
+        with connection(path) as conn, conn:
+            c = conn.cursor()
+
+            # Create users table
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password TEXT,
+                    email TEXT,
+                    full_name TEXT,
+                    role TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            # Create applications table
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS applications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    applicant_name TEXT,
+                    age INTEGER,
+                    gender TEXT,
+                    marital_status TEXT,
+                    employment_type TEXT,
+                    monthly_income REAL,
+                    loan_amount REAL,
+                    loan_type TEXT,
+                    purpose TEXT,
+                    risk_score REAL,
+                    risk_category TEXT,
+                    decision TEXT,
+                    officer_username TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (officer_username) REFERENCES users(username)
+                )
+            ''')
+
+            # Create borrowers table
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS borrowers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    borrower_id TEXT,
+                    name TEXT,
+                    current_risk_level TEXT,
+                    last_updated TIMESTAMP,
+                    officer_username TEXT,
+                    FOREIGN KEY (officer_username) REFERENCES users(username))
+            ''')
+
+            # Screening detail columns added after the original schema
+            existing = {row[1] for row in c.execute("PRAGMA table_info(applications)")}
+            for column, column_type in APPLICATION_EXTRA_COLUMNS:
+                if column not in existing:
+                    c.execute(f"ALTER TABLE applications ADD COLUMN {column} {column_type}")
+            # Observed outcome, filled in once a loan is repaid or written off;
+            # train.py uses it as the label. Not written at screening time.
+            if "default_status" not in existing:
+                c.execute("ALTER TABLE applications ADD COLUMN default_status INTEGER")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_applications_officer ON applications(officer_username)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_applications_created ON applications(created_at)")
+
+            # Re-scoring job bookkeeping: one row per borrower, upserted
+            existing = {row[1] for row in c.execute("PRAGMA table_info(borrowers)")}
+            if "input_hash" not in existing:
+                c.execute("ALTER TABLE borrowers ADD COLUMN input_hash TEXT")
+            c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_borrowers_borrower_id ON borrowers(borrower_id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_borrowers_last_updated ON borrowers(last_updated)")
+
+            # Login sessions (only a hash of the token is stored) and failed
+            # logins, so every worker process sees the same state
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    token_hash TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    FOREIGN KEY (username) REFERENCES users(username))
+            ''')
+            c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+            # Single-use, short-lived hand-offs of a new session token to the
+            # balancer, which sets it as an HttpOnly cookie
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS session_grants (
+                    grant_hash TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    max_age REAL,
+                    expires_at REAL NOT NULL)
+            ''')
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS auth_failures (
+                    key TEXT NOT NULL,
+                    failed_at REAL NOT NULL)
+            ''')
+            c.execute("CREATE INDEX IF NOT EXISTS idx_auth_failures_key ON auth_failures(key, failed_at)")
+
+            # Drift bin counts, one row per (model/workbook version, feature, bin)
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS drift_counts (
+                    version TEXT NOT NULL,
+                    feature TEXT NOT NULL,
+                    bin INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (version, feature, bin))
+            ''')
+        _initialized.add(path)
+
+
+# User rows only; password hashing and checks live in auth.py
+def insert_user(username, password_hash, email, full_name, role="credit_officer"):
+    try:
+        with connection() as conn, conn:
+            conn.execute(INSERT_USER, (username, password_hash, email, full_name, role))
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def get_user(username):
+    with connection() as conn:
+        row = conn.execute(SELECT_USER, (username,)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(("username", "password", "email", "full_name", "role"), row))
+
+
+def update_password(username, password_hash):
+    with connection() as conn, conn:
+        conn.execute(UPDATE_USER_PASSWORD, (password_hash, username))
+
+
+def insert_session(token_hash, username, created_at, expires_at):
+    with connection() as conn, conn:
+        conn.execute(INSERT_SESSION, (token_hash, username, created_at, expires_at))
+
+
+def get_session(token_hash):
+    # (username, expires_at) or None
+    with connection() as conn:
+        return conn.execute(SELECT_SESSION, (token_hash,)).fetchone()
+
+
+def delete_session(token_hash):
+    with connection() as conn, conn:
+        conn.execute(DELETE_SESSION, (token_hash,))
+
+
+def delete_expired_sessions(now):
+    with connection() as conn, conn:
+        return conn.execute(DELETE_EXPIRED_SESSIONS, (now,)).rowcount
+
+
+def insert_session_grant(grant_hash, token, max_age, expires_at):
+    with connection() as conn, conn:
+        conn.execute(INSERT_SESSION_GRANT, (grant_hash, token, max_age, expires_at))
+
+
+def take_session_grant(grant_hash, now):
+    # (token, max_age) and deletes the grant; None if unknown or expired
+    with connection() as conn, conn:
+        rows = conn.execute(TAKE_SESSION_GRANT, (grant_hash,)).fetchall()
+        conn.execute(DELETE_EXPIRED_SESSION_GRANTS, (now,))
+    if not rows or rows[0][2] <= now:
+        return None
+    return rows[0][0], rows[0][1]
+
+
+def recent_auth_failures(keys, since):
+    # {key: (count, oldest failed_at)} for failures after `since`
+    placeholders = ", ".join("?" * len(keys))
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT key, COUNT(*), MIN(failed_at) FROM auth_failures "
+            f"WHERE key IN ({placeholders}) AND failed_at > ? GROUP BY key", (*keys, since)).fetchall()
+    return {key: (count, oldest) for key, count, oldest in rows}
+
+
+def record_auth_failures(keys, failed_at):
+    with connection() as conn, conn:
+        conn.executemany(INSERT_AUTH_FAILURE, [(key, failed_at) for key in keys])
+
+
+def clear_auth_failures(key, before=None):
+    # Drops one key's failures, plus everything older than `before`
+    with connection() as conn, conn:
+        conn.execute(DELETE_AUTH_FAILURES, (key,))
+        if before is not None:
+            conn.execute(DELETE_OLD_AUTH_FAILURES, (before,))
+
+
+def add_drift_counts(version, counts, path=DB_PATH):
+    # counts: feature -> per-bin counts, added to the stored ones
+    rows = [(version, feature, int(b), int(n)) for feature, values in counts.items()
+            for b, n in enumerate(values) if n]
+    with connection(path) as conn, conn:
+        conn.executemany(ADD_DRIFT_COUNT, rows)
+
+
+def drift_counts(version, path=DB_PATH):
+    # [(feature, bin, count)] recorded for a version
+    with connection(path) as conn:
+        return conn.execute(SELECT_DRIFT_COUNTS, (version,)).fetchall()
+
+
+def application_row(applicant, result, officer_username, applicant_name=None, created_at=None):
+    # Maps a scoring input/result pair onto APPLICATION_COLUMNS
+    if created_at is None:
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    rule_flags = result["rule_flags"]
+    return (
+        applicant_name,
+        int(applicant["age"]),
+        applicant["gender"],
+        applicant["marital_status"],
+        applicant["employment_type"],
+        float(applicant["monthly_income_usd"]),
+        float(applicant["loan_amount_usd"]),
+        applicant["loan_type"],
+        applicant["purpose_of_loan"],
+        float(result["pd_score"]),
+        result["risk_label"],
+        "Decline" if result["final_prediction"] == 1 else "Approve",
+        officer_username,
+        created_at,
+        int(applicant["number_of_dependents"]),
+        applicant["education_level"],
+        int(applicant["repayment_period_months"]),
+        float(applicant["interest_rate_percent"]),
+        applicant["residential_area_type"],
+        applicant["sector_of_activity"],
+        int(result["model_prediction"]),
+        int(result["critical_violations"]),
+        int(result["overridden"]),
+        rule_flags if isinstance(rule_flags, str) else "; ".join(rule_flags),
+    )
+
+
+def record_outcome(application_id, default_status, path=DB_PATH):
+    # 1 if the loan defaulted, 0 if it was repaid
+    with connection(path) as conn, conn:
+        conn.execute(UPDATE_APPLICATION_OUTCOME, (int(default_status), application_id))
+
+
+def application_rows(scored, officer_username):
+    # Rows for a frame returned by scoring.score_frame
+    created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    names = scored["applicant_name"] if "applicant_name" in scored.columns else [None] * len(scored)
+    return [
+        application_row(record, record, officer_username, name, created_at)
+        for record, name in zip(scored.to_dict("records"), names)
+    ]
+
+
+class ApplicationWriter:
+    def __init__(self, path=DB_PATH, batch_size=WRITE_BATCH_SIZE, interval=WRITE_INTERVAL_SECONDS,
+                 attempts=WRITE_ATTEMPTS, retry_seconds=WRITE_RETRY_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.attempts = attempts
+        self.retry_seconds = retry_seconds
+        self.queue = queue.Queue(maxsize=WRITE_QUEUE_ROWS)
+        self.written = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="application-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        rows = list(rows)
+        for i, row in enumerate(rows):
+            try:
+                self.queue.put(row, timeout=WRITE_QUEUE_TIMEOUT_SECONDS)
+            except queue.Full:
+                dropped = rows[i:]
+                self.failed += len(dropped)
+                increment("applications_write_failed", len(dropped))
+                logger.error("Write queue full; dropped %d applications: %r", len(dropped), dropped)
+                return
+
+    def flush(self, timeout=None):
+        # Wait until everything submitted so far is committed (or dropped)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _drain(self):
+        rows = [self.queue.get()]
+        deadline = time.monotonic() + self.interval
+        while len(rows) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows):
+        delay = self.retry_seconds
+        for attempt in range(1, self.attempts + 1):
+            try:
+                init_db(self.path)  # no-op once the schema exists
+                with timed("db_write_batch"), connection(self.path) as conn, conn:
+                    conn.executemany(INSERT_APPLICATION, rows)
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == self.attempts:
+                    raise
+                increment("applications_write_retries")
+                logger.warning("Writing %d applications failed (%s); retrying in %.1fs", len(rows), e, delay)
+                time.sleep(delay)
+                delay *= 2
+
+    def _run(self):
+        while True:
+            rows = self._drain()
+            try:
+                self._write(rows)
+                self.written += len(rows)
+                increment("applications_written", len(rows))
+            except Exception:  # the thread must outlive any one batch
+                self.failed += len(rows)
+                increment("applications_write_failed", len(rows))
+                logger.exception("Dropped %d applications: %r", len(rows), rows)
+            finally:
+                for _ in rows:
+                    self.queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _application_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ApplicationWriter()
+            atexit.register(_writer.flush, 5.0)
+        return _writer
+
+
+def record_applications(rows):
+    _application_writer().submit(rows)
+
+
+def flush_applications(timeout=None):
+    return _writer.flush(timeout) if _writer is not None else True
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import os
+import secrets
+import signal
+import sys
+
+from balancer import start as start_balancer
+
+# Multi-worker deployment on one machine:
+#
+#   python deploy.py                                  # one app and one API worker per core
+#   python deploy.py --app-workers 4 --api-workers 8
+#
+# Streamlit workers listen on --worker-port, --worker-port + 1, ... behind
+# balancer.py on --port, which pins each browser to one worker. Scoring API
+# workers share --api-port through SO_REUSEPORT and the kernel spreads
+# connections across them; --api-balancer puts them behind balancer.py
+# instead, for platforms without that.
+#
+# Nothing a request needs lives only in one process:
+# - logins, sessions and login throttling are in sqlite (db.py, auth.py), so
+#   a browser that lands on another worker stays signed in;
+# - loan data is read from the memory-mapped feather cache (data_store.py)
+#   and the model's compiled trees from memory-mapped .npy files
+#   (model_registry.py), so workers share one copy in the page cache.
+# The caches and the schema are prepared once here before the workers
+# start, rather than raced by every worker. Workers that exit are restarted;
+# Ctrl-C or SIGTERM stops everything.
+
+APP_PORT = 8501
+WORKER_PORT = 8511
+API_PORT = 8600
+RESTART_DELAY_SECONDS = 1.0
+STOP_TIMEOUT_SECONDS = 10.0
+
+
+def prepare_shared_state():
+    from data_store import BORROWER_SHEET, LOAN_SHEET, sheet_cache_path
+    from db import init_db
+    from model_registry import get_model_bundle
+
+    init_db()
+    sheet_cache_path(LOAN_SHEET)
+    sheet_cache_path(BORROWER_SHEET)
+    get_model_bundle()
+
+
+def app_command(port):
+    return [sys.executable, "-m", "streamlit", "run", "Virl.py",
+            "--server.address", "127.0.0.1", "--server.port", str(port),
+            "--server.headless", "true", "--browser.gatherUsageStats", "false"]
+
+
+def api_command(port, reuse_port):
+    command = [sys.executable, "scoring_api.py", "--host", "127.0.0.1", "--port", str(port)]
+    return command + ["--reuse-port"] if reuse_port else command
+
+
+class Worker:
+    def __init__(self, name, command, env=None):
+        self.name = name
+        self.command = command
+        self.env = {**os.environ, **(env or {}), "MFI_METRICS_FILE": f"mfi_metrics.{name}.prom"}
+        self.process = None
+        self.restarts = 0
+
+    async def run(self, stopping):
+        # Keeps the worker running until `stopping` is set
+        while not stopping.is_set():
+            self.process = await asyncio.create_subprocess_exec(*self.command, env=self.env)
+            code = await self.process.wait()
+            if stopping.is_set():
+                return
+            self.restarts += 1
+            print(f"{self.name} exited with code {code}; restarting", file=sys.stderr)
+            await asyncio.sleep(RESTART_DELAY_SECONDS)
+
+    def stop(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+
+async def run(args):
+    prepare_shared_state()
+    workers, balancers = [], []
+
+    if args.app_workers:
+        # Same cookie secret on every app worker (Streamlit only takes it
+        # from the config file or environment), and the balancer's
+        # X-Forwarded-For is trusted for login throttling
+        env = {"STREAMLIT_SERVER_COOKIE_SECRET": secrets.token_hex(32), "MFI_TRUSTED_PROXIES": "127.0.0.1"}
+        ports = [args.worker_port + i for i in range(args.app_workers)]
+        workers += [Worker(f"app{i}", app_command(port), env) for i, port in enumerate(ports)]
+        balancers.append(await start_balancer(args.host, args.port, [("127.0.0.1", p) for p in ports]))
+        print(f"App: http://{args.host}:{args.port} -> {args.app_workers} Streamlit workers on ports "
+              f"{ports[0]}-{ports[-1]}")
+
+    if args.api_workers:
+        if args.api_balancer:
+            ports = [args.api_port + 1 + i for i in range(args.api_workers)]
+            workers += [Worker(f"api{i}", api_command(port, False)) for i, port in enumerate(ports)]
+            balancers.append(await start_balancer(args.host, args.api_port, [("127.0.0.1", p) for p in ports],
+                                                  affinity=False))
+        else:
+            workers += [Worker(f"api{i}", api_command(args.api_port, True)) for i in range(args.api_workers)]
+        print(f"API: http://{args.host}:{args.api_port} -> {args.api_workers} scoring API workers")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    tasks = [asyncio.create_task(worker.run(stopping)) for worker in workers]
+    await stopping.wait()
+    for _, server in balancers:
+        server.close()
+    for worker in workers:
+        worker.stop()
+    await asyncio.wait(tasks, timeout=STOP_TIMEOUT_SECONDS)
+    for worker in workers:
+        if worker.process is not None and worker.process.returncode is None:
+            worker.process.kill()
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Run the app and scoring API as several worker processes")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the balancers listen on")
+    parser.add_argument("--port", type=int, default=APP_PORT)
+    parser.add_argument("--worker-port", type=int, default=WORKER_PORT,
+                        help="First port for the Streamlit workers")
+    parser.add_argument("--api-port", type=int, default=API_PORT)
+    parser.add_argument("--app-workers", type=int, default=cores, help="0 to run only the scoring API")
+    parser.add_argument("--api-workers", type=int, default=cores, help="0 to run only the app")
+    parser.add_argument("--api-balancer", action="store_true",
+                        help="Put the API workers behind balancer.py instead of sharing one port")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_store import WORKBOOK_PATH, dataset_version, load_loans
+from db import DB_PATH, add_drift_counts, drift_counts, init_db
+from metrics import increment, timed
+from model_registry import MODEL_PATH, get_model_bundle, model_version
+from result_cache import cache
+from scoring import CATEGORICAL_COLUMNS, FEATURES, score_frame
+
+# Population stability of scored applicants against the training data.
+#
+# The baseline fixes the bins once per model and dataset version: decile
+# edges for numeric features and the PD score, one bin per known category
+# (plus one for unseen values) for categoricals. Every application scored
+# through the app's screening form, its bulk upload or the scoring API is
+# handed to record_scored as it is scored. The request only enqueues the
+# rows; a background thread bins them and adds the per-bin counts to the
+# drift_counts table under the model/workbook version, one transaction per
+# interval. Counts from every worker process accumulate there, nothing is
+# re-read from the applications table, and a restarted worker carries on
+# from the stored counts. Memory is one small array per feature whatever
+# the volume, and PSI/KS are computed from the counts on demand.
+
+PD_COLUMN = "pd_score"
+NUMERIC_BINS = 10
+SMOOTHING = 1e-4  # keeps PSI finite when a bin is empty on one side
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+RECORD_INTERVAL_SECONDS = 1.0
+MAX_PENDING_BATCHES = 10_000  # beyond this, scored rows are not monitored
+
+logger = logging.getLogger(__name__)
+
+
+class _Bins:
+    # Maps raw values to bin indices 0..n_bins-1
+    def __init__(self, edges=None, categories=None):
+        self.edges = edges
+        self.categories = categories
+        if categories is not None:
+            self.lookup = {category: i for i, category in enumerate(categories)}
+            self.n_bins = len(categories) + 1  # last bin collects unseen values
+        else:
+            self.n_bins = len(edges) + 1
+
+    def index(self, values):
+        if self.categories is not None:
+            codes = pd.Series(values).astype(str).map(self.lookup)
+            return codes.fillna(self.n_bins - 1).to_numpy(dtype=np.int64)
+        return np.searchsorted(self.edges, np.asarray(values, dtype=np.float64), side="right")
+
+    def counts(self, values):
+        return np.bincount(self.index(values), minlength=self.n_bins)
+
+
+def _numeric_bins(values):
+    edges = np.unique(np.quantile(np.asarray(values, dtype=np.float64), np.linspace(0, 1, NUMERIC_BINS + 1)[1:-1]))
+    return _Bins(edges=edges)
+
+
+def _baseline(model_path, data_path):
+    # Bins and reference counts from the training workbook and its PDs
+    loans = load_loans(data_path)
+    bundle = get_model_bundle(model_path)
+    scored, _ = score_frame(loans[FEATURES], bundle)
+    frame = loans[FEATURES].assign(**{PD_COLUMN: scored[PD_COLUMN].to_numpy()})
+    bins, counts = {}, {}
+    for col in FEATURES + [PD_COLUMN]:
+        if col in CATEGORICAL_COLUMNS:
+            bins[col] = _Bins(categories=[str(c) for c in bundle["label_encoders"][col].classes_])
+        else:
+            bins[col] = _numeric_bins(frame[col])
+        counts[col] = bins[col].counts(frame[col])
+    return {"bins": bins, "counts": counts, "rows": len(frame)}
+
+
+def baseline(model_path=MODEL_PATH, data_path=WORKBOOK_PATH):
+    version = f"{model_version(model_path)}-{dataset_version(data_path)}"
+    return version, cache.get_or_compute("drift_baseline", version, (model_path, data_path),
+                                         lambda: _baseline(model_path, data_path))
+
+
+def psi(expected, actual):
+    e = expected / max(expected.sum(), 1) + SMOOTHING
+    a = actual / max(actual.sum(), 1) + SMOOTHING
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def binned_ks(expected, actual):
+    # KS distance between the two binned CDFs
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.abs(a - e).max())
+
+
+def _status(value):
+    if value >= PSI_SIGNIFICANT:
+        return "Significant drift"
+    if value >= PSI_MODERATE:
+        return "Moderate drift"
+    return "Stable"
+
+
+class _Recorder:
+    # Bins scored applications off the request path and adds the counts to
+    # the database once per interval
+    def __init__(self, path=DB_PATH, interval=RECORD_INTERVAL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+        self._thread = threading.Thread(target=self._run, name="drift-recorder", daemon=True)
+        self._thread.start()
+
+    def submit(self, scored):
+        try:
+            self.queue.put_nowait(scored)
+        except queue.Full:
+            increment("drift_rows_dropped", len(scored))
+
+    def flush(self, timeout=None):
+        # Wait until everything submitted so far is recorded (or dropped)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _drain(self):
+        frames = [self.queue.get()]
+        deadline = time.monotonic() + self.interval
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                frames.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return frames
+
+    def _record(self, frames):
+        version, reference = baseline()
+        scored = pd.concat([f if isinstance(f, pd.DataFrame) else pd.DataFrame(f) for f in frames],
+                           ignore_index=True)
+        complete = scored.dropna(subset=list(reference["bins"]))
+        counts = {col: col_bins.counts(complete[col]) for col, col_bins in reference["bins"].items()}
+        with timed("drift_record"):
+            add_drift_counts(version, counts, self.path)
+        increment("drift_rows_recorded", len(complete))
+
+    def _run(self):
+        init_db(self.path)
+        while True:
+            frames = self._drain()
+            try:
+                self._record(frames)
+            except Exception:  # monitoring must never stop; the rows are lost
+                rows = sum(len(frame) for frame in frames)
+                increment("drift_record_failed", rows)
+                logger.exception("Could not record drift counts for %d applications", rows)
+            finally:
+                for _ in frames:
+                    self.queue.task_done()
+
+
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+
+def _recorder(path):
+    with _recorders_lock:
+        recorder = _recorders.get(path)
+        if recorder is None:
+            recorder = _recorders[path] = _Recorder(path)
+            atexit.register(recorder.flush, 5.0)
+        return recorder
+
+
+def record_scored(scored, path=DB_PATH):
+    # scored: frame with the model features and pd_score, as returned by
+    # scoring.score_frame, or a list of such records; only enqueued here
+    if len(scored):
+        _recorder(path).submit(scored[FEATURES + [PD_COLUMN]] if isinstance(scored, pd.DataFrame) else scored)
+
+
+def drift_report(db_path=DB_PATH, model_path=MODEL_PATH, data_path=WORKBOOK_PATH):
+    version, reference = baseline(model_path, data_path)
+    recorder = _recorders.get(db_path)
+    if recorder is not None:
+        recorder.flush(RECORD_INTERVAL_SECONDS * 2)  # include this process's latest rows
+    counts = {col: np.zeros(b.n_bins, dtype=np.int64) for col, b in reference["bins"].items()}
+    for feature, b, n in drift_counts(version, db_path):
+        if feature in counts and b < len(counts[feature]):
+            counts[feature][b] = n
+    applications = int(counts[PD_COLUMN].sum())  # every recorded row has one PD bin
+
+    rows = []
+    for col, col_bins in reference["bins"].items():
+        expected, actual = reference["counts"][col], counts[col]
+        value = psi(expected, actual) if applications else 0.0
+        rows.append({
+            "feature": col,
+            "psi": value,
+            "ks": binned_ks(expected, actual) if applications and col_bins.edges is not None else None,
+            "status": _status(value) if applications else "No data",
+        })
+    return {
+        "applications": applications,
+        "baseline_rows": reference["rows"],
+        "features": pd.DataFrame(rows).sort_values("psi", ascending=False, ignore_index=True),
+    }
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from data_store import WORKBOOK_PATH, dataset_version, load_loans
+from metrics import timed
+from model_registry import MODEL_PATH, get_model_bundle, model_version
+from result_cache import cache
+from scoring import FEATURES, encode_frame, encode_record, encoding_tables
+
+# Per-feature explanations of the model's probability of default.
+#
+# Contributions are path-based (Saabas): one pass over the compiled tree
+# arrays credits every split on a row's path with the change in node value,
+# so explaining a batch costs about as much as scoring it. Values are in
+# log-odds of default: positive pushes the PD up, negative pulls it down,
+# and bias plus the contributions reproduces the model's raw score.
+
+TOP_FACTORS = 3
+
+
+def _compiled(bundle):
+    compiled = bundle.get("compiled")
+    if compiled is None:
+        from compiled_model import compile_bundle
+        compiled = bundle["compiled"] = compile_bundle(bundle)
+    return compiled
+
+
+def explain_encoded(features, bundle):
+    with timed("explain"):
+        bias, contributions = _compiled(bundle).contributions(features)
+    return bias, contributions
+
+
+def explain_frame(df, bundle):
+    # Returns (bias, DataFrame of contributions with one column per feature)
+    bias, contributions = explain_encoded(encode_frame(df, encoding_tables(bundle)), bundle)
+    return bias, pd.DataFrame(contributions, columns=FEATURES, index=df.index)
+
+
+def explain_applicant(applicant, bundle):
+    bias, contributions = explain_encoded(encode_record(applicant, encoding_tables(bundle)), bundle)
+    return {
+        "bias": float(bias),
+        "contributions": dict(zip(FEATURES, contributions[0].tolist())),
+    }
+
+
+def top_factors(contributions, k=TOP_FACTORS):
+    # Labels of the k features pushing each row's PD up the most
+    order = np.argsort(-contributions, axis=1)[:, :k]
+    names = np.asarray(FEATURES)[order]
+    positive = np.take_along_axis(contributions, order, axis=1) > 0
+    return ["; ".join(name for name, keep in zip(row_names, row_keep) if keep)
+            for row_names, row_keep in zip(names, positive)]
+
+
+def annotate(result, bundle, k=TOP_FACTORS):
+    # Adds a top_risk_factors column to a scored batch
+    _, contributions = explain_encoded(encode_frame(result, encoding_tables(bundle)), bundle)
+    result["top_risk_factors"] = top_factors(contributions, k)
+    return result
+
+
+def global_importances(path=MODEL_PATH, data_path=WORKBOOK_PATH):
+    # Mean absolute contribution per feature over the loan book, cached per
+    # model and dataset version
+    version = (model_version(path), dataset_version(data_path))
+
+    def compute():
+        _, contributions = explain_frame(load_loans(data_path), get_model_bundle(path))
+        return contributions.abs().mean().sort_values(ascending=False)
+
+    return cache.get_or_compute("importances", version, path, compute)
@@ -0,0 +1,132 @@
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Chunked readers for loan and borrower sources (xlsx, CSV, Parquet and the
+# Feather cache), plus streaming aggregates for the dashboard and borrower
+# monitoring summaries. Only one chunk is held in memory at a time.
+
+CHUNK_ROWS = 50_000
+
+
+def _xlsx_chunks(path, sheet_name, chunksize):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c) for c in header]
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        wb.close()
+
+
+def _arrow_chunks(path, chunksize):
+    # Zero-copy slices of the memory-mapped batches
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize).to_pandas()
+
+
+def iter_chunks(path, sheet_name=None, chunksize=CHUNK_ROWS):
+    # "None" is a real education_level category, so CSV readers only treat
+    # empty cells as missing
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        yield from _xlsx_chunks(path, sheet_name, chunksize)
+    elif ext == ".csv":
+        yield from pd.read_csv(path, chunksize=chunksize, keep_default_na=False, na_values=[""])
+    elif ext == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif ext in (".feather", ".arrow"):
+        yield from _arrow_chunks(path, chunksize)
+    else:
+        raise ValueError(f"Unsupported source format: {path}")
+
+
+def _category_counts(values):
+    # Categorical value_counts also lists unobserved categories with zero
+    counts = values.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+def _sum64(values):
+    # float32 columns are accumulated in float64
+    return float(np.nansum(values.to_numpy(), dtype=np.float64))
+
+
+class LoanSummary:
+    # KPIs and purpose distribution for the Loan_Screening_Model sheet
+    def __init__(self):
+        self.total = 0
+        self.approved = 0
+        self.loan_sum = 0.0
+        self.purpose_counts = Counter()
+
+    def update(self, chunk):
+        self.total += len(chunk)
+        self.approved += int((chunk["default_status"] == 0).sum())
+        self.loan_sum += _sum64(chunk["loan_amount_usd"])
+        self.purpose_counts.update(_category_counts(chunk["purpose_of_loan"]))
+
+    def result(self):
+        total = self.total
+        return {
+            "total_apps": total,
+            "approved": self.approved,
+            "high_risk": total - self.approved,
+            "approval_rate": round((self.approved / total) * 100, 1) if total else 0.0,
+            "avg_loan_amount": round(self.loan_sum / total, 2) if total else 0.0,
+            "purpose_counts": dict(self.purpose_counts.most_common()),
+        }
+
+
+class BorrowerSummary:
+    # Portfolio overview and risk-level distribution for Borrower_Tracking_Data
+    def __init__(self):
+        self.total = 0
+        self.repayment_sum = 0.0
+        self.repayment_count = 0
+        self.risk_level_counts = Counter()
+
+    def update(self, chunk):
+        scores = chunk["repayment_history_score"]
+        self.total += len(chunk)
+        self.repayment_sum += _sum64(scores)
+        self.repayment_count += int(scores.count())
+        self.risk_level_counts.update(_category_counts(chunk["current_risk_level"]))
+
+    def result(self):
+        return {
+            "borrowers": self.total,
+            "avg_repayment_score": self.repayment_sum / self.repayment_count if self.repayment_count else 0.0,
+            "high_risk": self.risk_level_counts.get("High", 0),
+            "risk_level_counts": dict(self.risk_level_counts.most_common()),
+        }
+
+
+def summarize(path, summary, sheet_name=None, chunksize=CHUNK_ROWS):
+    for chunk in iter_chunks(path, sheet_name, chunksize):
+        summary.update(chunk)
+    return summary.result()
@@ -0,0 +1,100 @@
+import threading
+
+from data_store import BORROWER_SHEET, LOAN_SHEET, WORKBOOK_PATH, dataset_version, sheet_cache_path
+from db import DB_PATH, connection
+from ingest import BorrowerSummary, LoanSummary, summarize
+from result_cache import cache
+
+# Dashboard KPIs kept as running aggregates instead of being recomputed
+# from a full DataFrame on every rerun.
+#
+# - Portfolio KPIs are streamed chunk by chunk out of the columnar cache once
+#   per dataset version, so memory stays bounded by one chunk regardless of
+#   portfolio size. Borrower KPIs are aggregated once per workbook and
+#   re-scoring version over the borrower frame Borrower Monitoring already
+#   holds, with the same BorrowerSummary.
+# - Screening KPIs come from the applications table. Each refresh only
+#   aggregates rows above the last seen id, so the cost tracks new
+#   applications rather than the size of the history, and writes from other
+#   worker processes are picked up too.
+
+_lock = threading.Lock()
+_screening = {}
+
+AGGREGATE_NEW_APPLICATIONS = """
+    SELECT COUNT(*),
+           COALESCE(SUM(decision = 'Approve'), 0),
+           COALESCE(SUM(overridden), 0),
+           COALESCE(SUM(loan_amount), 0.0),
+           COALESCE(SUM(risk_score), 0.0),
+           MAX(id)
+    FROM applications
+    WHERE id > ?
+"""
+
+
+def _summary(sheet_name, summary_class, path):
+    version = dataset_version(path)
+
+    def compute():
+        result = summarize(sheet_cache_path(sheet_name, path), summary_class())
+        result["version"] = version
+        return result
+
+    return cache.get_or_compute(f"summary:{sheet_name}", version, path, compute)
+
+
+def portfolio_kpis(path=WORKBOOK_PATH):
+    return _summary(LOAN_SHEET, LoanSummary, path)
+
+
+def monitored_borrower_kpis(borrowers, version):
+    # Borrower KPIs over the workbook's borrowers with their re-scored levels
+    # (rescoring.with_rescored_levels): the workbook figures, plus re-scored
+    # high risk and how many re-scored levels differ from the workbook's
+    def compute():
+        summary = BorrowerSummary()
+        summary.update(borrowers)
+        result = summary.result()
+        rescored = borrowers["rescored_risk_level"]
+        workbook = borrowers["current_risk_level"].astype(object).to_numpy()
+        result["rescored"] = int(rescored.notna().sum())
+        result["rescored_high_risk"] = int((rescored == "High").sum())
+        result["rescored_changes"] = int((rescored.notna().to_numpy() & (rescored.astype(object).to_numpy() != workbook)).sum())
+        result["version"] = version
+        return result
+
+    return cache.get_or_compute("summary:monitored_borrowers", version, BORROWER_SHEET, compute)
+
+
+def screening_kpis(path=DB_PATH):
+    with _lock:
+        state = _screening.setdefault(path, {
+            "last_id": 0, "count": 0, "approved": 0, "overridden": 0,
+            "loan_sum": 0.0, "pd_sum": 0.0,
+        })
+        last_id = state["last_id"]
+
+    with connection(path) as conn:
+        count, approved, overridden, loan_sum, pd_sum, max_id = conn.execute(
+            AGGREGATE_NEW_APPLICATIONS, (last_id,)).fetchone()
+
+    with _lock:
+        # Another session may have applied the same delta meanwhile
+        if count and state["last_id"] == last_id:
+            state["count"] += count
+            state["approved"] += approved
+            state["overridden"] += overridden
+            state["loan_sum"] += loan_sum
+            state["pd_sum"] += pd_sum
+            state["last_id"] = max_id
+        total = state["count"]
+        return {
+            "total": total,
+            "approved": state["approved"],
+            "declined": total - state["approved"],
+            "overridden": state["overridden"],
+            "approval_rate": round(state["approved"] / total * 100, 1) if total else 0.0,
+            "avg_loan_amount": round(state["loan_sum"] / total, 2) if total else 0.0,
+            "avg_pd": state["pd_sum"] / total if total else 0.0,
+        }
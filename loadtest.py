@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from data_store import load_loans
+from scoring import FEATURES
+
+# Scoring API throughput against the number of worker processes.
+#
+#   python loadtest.py --workers 1,2,4           # starts deploy.py for each count
+#   python loadtest.py --url http://127.0.0.1:8600 --duration 30
+#
+# Each request scores one application drawn from the loan book, like a
+# loan-origination system would. Load comes from --clients processes, each
+# running --concurrency keep-alive connections on its own event loop, so the
+# generator itself is not the bottleneck. The report gives requests/s,
+# latency percentiles and the speed-up over one worker; scaling can only be
+# near-linear while workers plus clients fit on separate cores.
+
+SAMPLE_APPLICATIONS = 256
+READY_TIMEOUT_SECONDS = 120.0
+LOADTEST_PORT = 8700
+
+
+def sample_payloads(n=SAMPLE_APPLICATIONS, seed=0):
+    loans = load_loans()[FEATURES]
+    records = json.loads(loans.sample(min(n, len(loans)), random_state=seed).to_json(orient="records"))
+    return [json.dumps({"application": record}).encode() for record in records]
+
+
+async def _request(reader, writer, host, body):
+    writer.write(b"POST /score HTTP/1.1\r\nHost: " + host.encode() + b"\r\nContent-Type: application/json\r\n"
+                 b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _connection(host, port, payloads, offset, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await _request(reader, writer, host, payloads[i % len(payloads)])
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors.append("connection")
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+
+def _client(url, payloads, concurrency, duration, start_at, client_index):
+    # One load-generating process; returns (latencies, error count)
+    parts = urlsplit(url)
+    latencies, errors = [], []
+
+    async def drive():
+        await asyncio.sleep(max(start_at - time.time(), 0))
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _connection(parts.hostname, parts.port, payloads, (client_index * concurrency + i) * 7, deadline,
+                        latencies, errors)
+            for i in range(concurrency)))
+
+    asyncio.run(drive())
+    return latencies, len(errors)
+
+
+def run_load(url, payloads, clients, concurrency, duration):
+    start_at = time.time() + 1.0  # every client starts together
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(_client, url, payloads, concurrency, duration, start_at, i) for i in range(clients)]
+        results = [future.result() for future in futures]
+    latencies = np.concatenate([np.asarray(r[0]) for r in results]) * 1000
+    errors = sum(r[1] for r in results)
+    return {
+        "requests": int(len(latencies)),
+        "errors": errors,
+        "throughput": len(latencies) / duration,
+        "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else None,
+        "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+
+
+def wait_until_ready(url, workers, timeout=READY_TIMEOUT_SECONDS):
+    # Polls /health on new connections until every worker has answered
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=2) as response:
+                pids.add(json.load(response)["pid"])
+        except OSError:
+            time.sleep(0.2)
+            continue
+        if len(pids) >= workers:
+            return
+    raise RuntimeError(f"Only {len(pids)} of {workers} API workers answered within {timeout:.0f}s")
+
+
+def start_deployment(workers, port, api_balancer):
+    command = [sys.executable, "deploy.py", "--app-workers", "0", "--api-workers", str(workers),
+               "--api-port", str(port)]
+    if api_balancer:
+        command.append("--api-balancer")
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+
+def stop_deployment(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring API throughput vs worker count")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated API worker counts to start")
+    parser.add_argument("--url", help="Test an already running deployment instead of starting one")
+    parser.add_argument("--port", type=int, default=LOADTEST_PORT)
+    parser.add_argument("--api-balancer", action="store_true", help="Route through balancer.py")
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Load-generating processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Connections per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    payloads = sample_payloads()
+    runs = []
+    if args.url:
+        runs.append({"workers": None, **run_load(args.url, payloads, args.clients, args.concurrency, args.duration)})
+    else:
+        url = f"http://127.0.0.1:{args.port}"
+        for workers in (int(w) for w in args.workers.split(",")):
+            deployment = start_deployment(workers, args.port, args.api_balancer)
+            try:
+                wait_until_ready(url, workers)
+                run_load(url, payloads, args.clients, args.concurrency, 1.0)  # warm-up
+                runs.append({"workers": workers,
+                             **run_load(url, payloads, args.clients, args.concurrency, args.duration)})
+            finally:
+                stop_deployment(deployment)
+
+    base = runs[0]["throughput"] / (runs[0]["workers"] or 1)
+    print(f"{'workers':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'speed-up':>9}")
+    for run in runs:
+        speedup = run["throughput"] / runs[0]["throughput"] if runs[0]["throughput"] else 0.0
+        run["efficiency"] = run["throughput"] / (base * (run["workers"] or 1)) if base else 0.0
+        print(f"{run['workers'] or '-':>8} {run['throughput']:>9.0f} {run['p50_ms'] or 0:>8.2f} "
+              f"{run['p95_ms'] or 0:>8.2f} {run['p99_ms'] or 0:>8.2f} {run['errors']:>7} {speedup:>8.2f}x")
+    cores = os.cpu_count() or 1
+    if any((run["workers"] or 0) + args.clients > cores for run in runs):
+        print(f"Note: {cores} CPU core(s); runs with more workers + clients than cores share CPUs, "
+              f"so their scaling is capped")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cores": cores, "clients": args.clients, "concurrency": args.concurrency,
+                       "duration": args.duration, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
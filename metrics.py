@@ -0,0 +1,130 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# In-process latency histograms and counters for the hot paths (model and
+# data loading, encoding, prediction, rules, DB calls, chart building).
+# Each timer keeps cumulative Prometheus-style buckets plus a rolling window
+# of recent samples for percentiles. The text exposition can be served over
+# HTTP (scoring_api /metrics) or written to METRICS_FILE for a node exporter
+# textfile collector. Standard library only, so the login page can record
+# timings without importing numpy.
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW = 1024
+# deploy.py gives each worker process its own file
+METRICS_FILE = os.environ.get("MFI_METRICS_FILE", "mfi_metrics.prom")
+EXPORT_INTERVAL_SECONDS = 15
+
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_last_export = 0.0
+
+
+class _Timer:
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)  # per-bucket, made cumulative on export
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+
+def observe(name, seconds):
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = _Timer()
+        timer.observe(seconds)
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def _percentile(ordered, q):
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def snapshot():
+    # Rolling-window percentiles per timer, plus lifetime counts
+    with _lock:
+        timers = {name: (timer.count, timer.total, list(timer.recent)) for name, timer in _timers.items()}
+        counters = dict(_counters)
+    summary = {}
+    for name, (count, total, recent) in sorted(timers.items()):
+        recent = sorted(seconds * 1000 for seconds in recent)
+        summary[name] = {
+            "count": count,
+            "mean_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": _percentile(recent, 50),
+            "p95_ms": _percentile(recent, 95),
+            "p99_ms": _percentile(recent, 99),
+        }
+    return summary, counters
+
+
+def _metric_name(name):
+    return "mfi_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def render_prometheus():
+    with _lock:
+        timers = {name: (list(timer.bucket_counts), timer.count, timer.total) for name, timer in _timers.items()}
+        counters = dict(_counters)
+
+    lines = []
+    for name, (bucket_counts, count, total) in sorted(timers.items()):
+        metric = _metric_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{metric}_sum {total}")
+        lines.append(f"{metric}_count {count}")
+    for name, value in sorted(counters.items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def export_to_file(path=METRICS_FILE, min_interval=EXPORT_INTERVAL_SECONDS):
+    # Throttled so reruns don't rewrite the file on every interaction
+    global _last_export
+    now = time.monotonic()
+    with _lock:
+        if now - _last_export < min_interval:
+            return False
+        _last_export = now
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+    return True
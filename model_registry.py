@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from metrics import increment, observe
+
+MODEL_PATH = "credit_risk_gb_model.pkl"
+# Compiled tree arrays, one directory per model content hash, memory-mapped
+# by every worker process that loads that model
+COMPILED_DIR = os.path.join(".data_cache", "compiled")
+COMPILED_FORMAT = 2
+
+# Process-wide registry: one warm bundle per model file, shared by every
+# Streamlit session and rerun in this worker process.
+_lock = threading.Lock()
+_entries = {}
+_metadata = {}
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _rss_bytes():
+    # Resident set size of this process; 0 where /proc is unavailable
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _shared_compiled(bundle, sha256):
+    # The first process to load a model writes its compiled arrays; the rest
+    # (and later restarts) map the same files instead of compiling
+    from compiled_model import CompiledModel, compile_bundle
+
+    directory = os.path.join(COMPILED_DIR, f"v{COMPILED_FORMAT}-{sha256[:16]}")
+    if not os.path.isdir(directory):
+        staging = f"{directory}.{os.getpid()}.tmp"
+        compile_bundle(bundle).export(staging)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)  # another process got there first
+    return CompiledModel.load_shared(directory)
+
+
+def _load(path, signature, sha256):
+    # joblib/sklearn and the scoring stack are imported on first load, so
+    # importing the registry (e.g. for model_stats) stays cheap
+    import joblib
+
+    from scoring import compile_encoders
+
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    # Arrays inside the pickle are memory-mapped rather than copied
+    bundle = dict(joblib.load(path, mmap_mode="r"))
+    bundle["compiled"] = _shared_compiled(bundle, sha256)
+    bundle["encoders"] = compile_encoders(bundle["label_encoders"])
+    load_seconds = time.perf_counter() - start
+    observe("model_load", load_seconds)
+    return {
+        "bundle": bundle,
+        "signature": signature,
+        "sha256": sha256,
+        "load_seconds": load_seconds,
+        "file_bytes": signature[1],
+        "rss_delta_bytes": max(_rss_bytes() - rss_before, 0),
+        "loaded_at": time.time(),
+        "load_count": 0,
+        "hits": 0,
+    }
+
+
+def get_model_bundle(path=MODEL_PATH):
+    # Cheap stat() on every call; the file is only re-hashed when its mtime or
+    # size moves, and only re-unpickled when the content hash actually differs.
+    signature = _file_signature(path)
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and entry["signature"] == signature:
+            entry["hits"] += 1
+            increment("model_cache_hits")
+            return entry["bundle"]
+
+        sha256 = _file_hash(path)
+        if entry is not None and entry["sha256"] == sha256:
+            entry["signature"] = signature
+            entry["hits"] += 1
+            return entry["bundle"]
+
+        load_count = entry["load_count"] if entry is not None else 0
+        entry = _load(path, signature, sha256)
+        entry["load_count"] = load_count + 1
+        _entries[path] = entry
+        return entry["bundle"]
+
+
+def model_version(path=MODEL_PATH):
+    get_model_bundle(path)
+    return _entries[path]["sha256"][:12]
+
+
+def metadata_path(path=MODEL_PATH):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def model_metadata(path=MODEL_PATH):
+    # Training metadata written by train.py next to the artifact. None when
+    # there is none, or when it describes a different file than the one on
+    # disk. Doesn't load the model; both files are only re-read when their
+    # mtime or size changes.
+    meta_path = metadata_path(path)
+    try:
+        meta_signature = _file_signature(meta_path)
+        signature = _file_signature(path)
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _metadata.get(path)
+    if cached is None or cached["meta_signature"] != meta_signature or cached["signature"] != signature:
+        with open(meta_path) as f:
+            metadata = json.load(f)
+        cached = {"meta_signature": meta_signature, "signature": signature,
+                  "metadata": metadata, "sha256": _file_hash(path)}
+        with _lock:
+            _metadata[path] = cached
+    metadata = cached["metadata"]
+    return metadata if metadata.get("sha256") == cached["sha256"] else None
+
+
+def model_stats(path=MODEL_PATH):
+    with _lock:
+        entry = _entries.get(path)
+        if entry is None:
+            return None
+        return {
+            "path": path,
+            "sha256": entry["sha256"],
+            "load_seconds": entry["load_seconds"],
+            "file_bytes": entry["file_bytes"],
+            "rss_delta_bytes": entry["rss_delta_bytes"],
+            "loaded_at": entry["loaded_at"],
+            "load_count": entry["load_count"],
+            "hits": entry["hits"],
+        }
@@ -0,0 +1,48 @@
+import numpy as np
+
+from result_cache import cache
+
+# Server-side filtering, ordering and paging for the borrower and loan
+# tables. The row order for a (filter, sort) combination is worked out once
+# per dataset version; each request then materializes only one page.
+
+PAGE_SIZES = [10, 25, 50, 100]
+
+
+def _row_order(df, dataset, filters, sort_by, ascending):
+    # dataset is a (name, version) pair identifying the frame's contents
+    name, version = dataset
+    return cache.get_or_compute(f"row_order:{name}", version, (filters, sort_by, ascending),
+                                lambda: _compute_row_order(df, filters, sort_by, ascending))
+
+
+def _compute_row_order(df, filters, sort_by, ascending):
+    mask = np.ones(len(df), dtype=bool)
+    for column, value in filters:
+        values = df[column]
+        if values.dtype == "category":
+            # Compare integer codes instead of strings
+            code = values.cat.categories.get_indexer([value])[0]
+            mask &= (values.cat.codes.to_numpy() == code) if code >= 0 else False
+        else:
+            mask &= (values == value).to_numpy()
+    positions = np.flatnonzero(mask)
+    if sort_by is not None:
+        values = df[sort_by].to_numpy()[positions]
+        ranks = np.argsort(values, kind="stable")
+        positions = positions[ranks if ascending else ranks[::-1]]
+    elif not ascending:
+        positions = positions[::-1]
+    return positions
+
+
+def paginate(df, dataset, page=1, page_size=10, filters=(), sort_by=None, ascending=True):
+    # filters is a tuple of (column, value) equality pairs; returns the
+    # requested page plus the total matching row count and number of pages
+    filters = tuple(filters)
+    positions = _row_order(df, dataset, filters, sort_by, ascending)
+    total = len(positions)
+    n_pages = max(1, -(-total // page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return df.iloc[positions[start:start + page_size]], total, n_pages
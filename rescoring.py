@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from data_store import BORROWER_SHEET, WORKBOOK_PATH, sheet_cache_path
+from db import DB_PATH, connection, init_db
+from ingest import iter_chunks
+from result_cache import cache
+from rules import OVERRIDE_THRESHOLD, CompiledRules
+
+# Background re-scoring of the borrower book into the borrowers table.
+#
+# The credit model scores loan applications and needs application fields
+# that Borrower_Tracking_Data does not have, so active borrowers are scored
+# with a behavioural policy instead:
+#
+# - a risk band from repayment_history_score. RISK_BANDS are the workbook's
+#   own banding (High up to 0.60, Medium 0.61-0.80, Low from 0.81), so a
+#   re-score agrees with the sheet until a borrower's repayment score moves;
+# - escalation by one level when override_threshold or more BEHAVIOUR_RULES
+#   fire. These thresholds are provisional early-warning defaults, not
+#   approved credit policy; credit policy replaces them with a JSON file
+#   passed as --policy (same shape as rules.load_rules plus "risk_bands").
+#   After changing the policy, run once with --full.
+#
+# Only borrowers whose inputs changed, or whose last_updated is older than
+# the staleness window, are re-scored on later runs. Borrower Monitoring
+# shows the result as its own rescored_risk_level column next to the
+# workbook's current_risk_level, joined on borrower_id
+# (with_rescored_levels); the workbook level is left as it is.
+
+BEHAVIOUR_COLUMNS = [
+    "repayment_history_score",
+    "missed_payments_last_6_months",
+    "days_late_average",
+    "savings_balance_usd",
+    "group_affiliation_strength",
+]
+
+# Repayment history score bands: below the first bound is High risk, below
+# the second is Medium, anything else Low (the scores have two decimals)
+RISK_BANDS = (0.605, 0.805)
+RISK_LEVELS = np.array(["High", "Medium", "Low"])
+
+BEHAVIOUR_RULES = [
+    {
+        "name": "missed_payments",
+        "field": "missed_payments_last_6_months",
+        "kind": "greater_than",
+        "threshold": 3,
+        "severity": "critical",
+        "message": "More than {threshold} missed payments in the last 6 months",
+    },
+    {
+        "name": "days_late",
+        "field": "days_late_average",
+        "kind": "greater_than",
+        "threshold": 15,
+        "severity": "critical",
+        "message": "Payments are on average more than {threshold} days late",
+    },
+    {
+        "name": "no_savings",
+        "field": "savings_balance_usd",
+        "kind": "less_than",
+        "threshold": 1,
+        "severity": "critical",
+        "message": "Savings balance below ${threshold}",
+    },
+]
+
+STALE_AFTER_HOURS = 24
+PARTITION_ROWS = 50_000
+
+UPSERT_BORROWER = """
+    INSERT INTO borrowers (borrower_id, current_risk_level, last_updated, input_hash)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(borrower_id) DO UPDATE SET
+        current_risk_level = excluded.current_risk_level,
+        last_updated = excluded.last_updated,
+        input_hash = excluded.input_hash
+"""
+
+SELECT_RISK_LEVELS = "SELECT borrower_id, current_risk_level FROM borrowers"
+RESCORING_STATUS = """
+    SELECT COUNT(*), MAX(last_updated), TOTAL(current_risk_level = 'High'), TOTAL(current_risk_level = 'Medium')
+    FROM borrowers
+"""
+
+# (risk bands, compiled escalation rules)
+DEFAULT_POLICY = (RISK_BANDS, CompiledRules(BEHAVIOUR_RULES))
+
+
+def load_policy(path):
+    # JSON file: {"risk_bands": [0.605, 0.805], "rules": [...], "override_threshold": 2}
+    with open(path) as f:
+        policy = json.load(f)
+    bands = tuple(float(bound) for bound in policy["risk_bands"])
+    if len(bands) != len(RISK_LEVELS) - 1 or list(bands) != sorted(bands):
+        raise ValueError(f"risk_bands must be {len(RISK_LEVELS) - 1} increasing bounds")
+    return bands, CompiledRules(policy["rules"], policy.get("override_threshold", OVERRIDE_THRESHOLD))
+
+
+def score_borrowers(df, policy=DEFAULT_POLICY):
+    # Runs in worker processes; returns one risk level per row
+    bands, rules = policy
+    band = np.searchsorted(bands, df["repayment_history_score"].to_numpy(dtype=float), side="right")
+    _, _, escalate, _ = rules.evaluate(df)
+    band = np.where(escalate, np.maximum(band - 1, 0), band)
+    return RISK_LEVELS[band]
+
+
+def _score_partition(partition):
+    borrower_ids, frame, policy = partition
+    return borrower_ids, score_borrowers(frame, policy)
+
+
+def _input_hashes(df):
+    return pd.util.hash_pandas_object(df[BEHAVIOUR_COLUMNS], index=False).map("{:016x}".format).to_numpy()
+
+
+def _current_state(db_path):
+    with connection(db_path) as conn:
+        state = pd.read_sql("SELECT borrower_id, input_hash, last_updated, current_risk_level FROM borrowers",
+                            conn, index_col="borrower_id")
+    state["last_updated"] = state["last_updated"].fillna("")
+    return state
+
+
+def _needs_scoring(borrower_ids, hashes, state, stale_before, full):
+    if full or state.empty:
+        return np.ones(len(borrower_ids), dtype=bool)
+    previous = state.reindex(borrower_ids)
+    return (previous["input_hash"].to_numpy() != hashes) \
+        | ~(previous["last_updated"].fillna("").to_numpy(dtype=object) >= stale_before)
+
+
+def rescore(source=None, db_path=DB_PATH, workers=None, stale_after_hours=STALE_AFTER_HOURS,
+            partition_rows=PARTITION_ROWS, full=False, policy=DEFAULT_POLICY):
+    source = source or sheet_cache_path(BORROWER_SHEET, WORKBOOK_PATH)
+    init_db(db_path)
+    started = time.perf_counter()
+    now = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    stale_before = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - stale_after_hours * 3600))
+    state = _current_state(db_path)
+
+    # Work out what changed in the parent, score partitions in the pool
+    partitions = []
+    hashes = {}  # borrower_id -> input hash for the rows being re-scored
+    seen = 0
+    for chunk in iter_chunks(source, BORROWER_SHEET, partition_rows):
+        seen += len(chunk)
+        borrower_ids = chunk["borrower_id"].astype(str).to_numpy()
+        chunk_hashes = _input_hashes(chunk)
+        needs = _needs_scoring(borrower_ids, chunk_hashes, state, stale_before, full)
+        if needs.any():
+            partitions.append((borrower_ids[needs], chunk.loc[needs, BEHAVIOUR_COLUMNS].reset_index(drop=True),
+                               policy))
+            hashes.update(zip(borrower_ids[needs], chunk_hashes[needs]))
+
+    scored = changed = 0
+    if partitions:
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(partitions) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as pool:
+                results = list(pool.map(_score_partition, partitions))
+        else:
+            results = [_score_partition(p) for p in partitions]
+
+        with connection(db_path) as conn, conn:
+            for borrower_ids, levels in results:
+                conn.executemany(UPSERT_BORROWER, zip(borrower_ids.tolist(), levels.tolist(), repeat(now),
+                                                      [hashes[b] for b in borrower_ids]))
+                scored += len(borrower_ids)
+                # Borrowers scored for the first time have no level to change from
+                previous_levels = state["current_risk_level"].reindex(borrower_ids)
+                changed += int((previous_levels.notna().to_numpy() & (previous_levels.to_numpy() != levels)).sum())
+
+    return {
+        "borrowers": seen,
+        "rescored": scored,
+        "risk_level_changes": changed,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def rescoring_status(db_path=DB_PATH):
+    with connection(db_path) as conn:
+        count, last_run, high, medium = conn.execute(RESCORING_STATUS).fetchone()
+    # last_run has one-second resolution; the level counts also tell apart
+    # runs within the same second
+    return {"borrowers": count, "last_run": last_run, "version": f"{count}-{last_run}-{high:.0f}-{medium:.0f}"}
+
+
+def with_rescored_levels(df, dataset_version, db_path=DB_PATH):
+    # Borrower frame with a rescored_risk_level column (missing for borrowers
+    # not re-scored yet) next to the workbook's current_risk_level. Returns
+    # the frame and a version covering the workbook and the last run.
+    status = rescoring_status(db_path)
+    version = f"{dataset_version}-{status['version']}"
+
+    def compute():
+        with connection(db_path) as conn:
+            levels = pd.read_sql(SELECT_RISK_LEVELS, conn, index_col="borrower_id")["current_risk_level"]
+        rescored = df["borrower_id"].astype(str).map(levels)
+        return df.assign(rescored_risk_level=pd.Categorical(rescored, categories=RISK_LEVELS))
+
+    return cache.get_or_compute("rescored_borrowers", version, db_path, compute), version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score borrower risk levels into the borrowers table")
+    parser.add_argument("--source", help="Borrower file (xlsx/csv/parquet/feather); defaults to the workbook sheet")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--stale-after-hours", type=float, default=STALE_AFTER_HOURS)
+    parser.add_argument("--partition-rows", type=int, default=PARTITION_ROWS)
+    parser.add_argument("--full", action="store_true", help="Re-score every borrower regardless of state")
+    parser.add_argument("--policy", help="JSON risk bands and escalation rules replacing the defaults")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Repeat every N seconds instead of running once")
+    args = parser.parse_args()
+
+    policy = load_policy(args.policy) if args.policy else DEFAULT_POLICY
+    while True:
+        summary = rescore(args.source, args.db, args.workers, args.stale_after_hours,
+                          args.partition_rows, args.full, policy)
+        print(f"Scanned {summary['borrowers']:,} borrowers, re-scored {summary['rescored']:,} "
+              f"({summary['risk_level_changes']:,} risk level changes) in {summary['seconds']}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# Process-wide cache for artifacts derived from the workbook or database
+# (summaries, row orderings, Plotly figures), shared by every session in the
+# worker. Entries are keyed by (namespace, version, key): when a namespace
+# sees a new data version, its older entries are dropped. Eviction is LRU,
+# bounded by entry count and approximate size in bytes.
+
+MAX_ENTRIES = 256
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def _sizeof(value):
+    # Duck-typed so importing the cache doesn't pull in numpy/pandas
+    memory_usage = getattr(value, "memory_usage", None)
+    if memory_usage is not None:  # pandas DataFrame (per-column Series) or Series (int)
+        usage = memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if hasattr(value, "nbytes"):  # numpy arrays
+        return int(value.nbytes)
+    if hasattr(value, "to_json"):  # Plotly figures
+        return len(value.to_json())
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _drop(self, full_key):
+        _, size = self._entries.pop(full_key)
+        self._bytes -= size
+
+    def _invalidate(self, namespace, version):
+        # Caller holds the lock
+        if self._versions.get(namespace) == version:
+            return
+        self._versions[namespace] = version
+        for full_key in [k for k in self._entries if k[0] == namespace and k[1] != version]:
+            self._drop(full_key)
+
+    def get(self, namespace, version, key):
+        full_key = (namespace, version, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, namespace, version, key, value):
+        size = _sizeof(value)
+        full_key = (namespace, version, key)
+        with self._lock:
+            self._invalidate(namespace, version)
+            if full_key in self._entries:
+                self._drop(full_key)
+            if size > self.max_bytes:
+                return value
+            self._entries[full_key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def get_or_compute(self, namespace, version, key, compute):
+        # Values are treated as read-only once cached
+        value = self.get(namespace, version, key)
+        if value is None:
+            value = self.put(namespace, version, key, compute())
+        return value
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for full_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+                self._drop(full_key)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+cache = ResultCache()
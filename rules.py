@@ -0,0 +1,165 @@
+import json
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+# Credit-policy rules declared as data. Each rule is compiled into a
+# vectorized predicate over whole columns, so a batch of any size is checked
+# in one pass per rule. Policy changes only need the definitions (or a JSON
+# file with the same shape passed to load_rules) to change.
+#
+# kind           parameters        flagged when
+# outside        low, high         value < low or value > high
+# greater_than   threshold         value > threshold
+# less_than      threshold         value < threshold
+# equals         value             value == value
+# share_above    of, share         value > share * of
+
+DEFAULT_RULES = [
+    {
+        "name": "age_bracket",
+        "field": "age",
+        "kind": "outside",
+        "low": 21,
+        "high": 60,
+        "severity": "critical",
+        "message": "Age is outside the preferred lending bracket ({low}–{high})",
+    },
+    {
+        "name": "dependents",
+        "field": "number_of_dependents",
+        "kind": "greater_than",
+        "threshold": 3,
+        "severity": "critical",
+        "message": "More than {threshold} dependents may strain income",
+    },
+    {
+        "name": "instalment_burden",
+        "field": "monthly_instalment",
+        "kind": "share_above",
+        "of": "monthly_income_usd",
+        "share": 0.4,
+        "severity": "critical",
+        "message": "Loan burden ({value:.2f}) exceeds {share:.0%} of monthly income ({of_value:.2f})",
+    },
+    {
+        "name": "income_floor",
+        "field": "monthly_income_usd",
+        "kind": "less_than",
+        "threshold": 80,
+        "severity": "critical",
+        "message": "Monthly income is below sustainable threshold (${threshold})",
+    },
+    {
+        "name": "unemployed",
+        "field": "employment_type",
+        "kind": "equals",
+        "value": "Unemployed",
+        "severity": "critical",
+        "message": "Unemployment increases risk of default",
+    },
+]
+
+# Number of critical rule violations that overrides the model to High Risk
+OVERRIDE_THRESHOLD = 2
+
+SEVERITIES = ("critical", "warning")
+
+
+def _monthly_instalment(columns):
+    return (columns["loan_amount_usd"] * (1 + (columns["interest_rate_percent"] / 100))) \
+        / columns["repayment_period_months"]
+
+
+# Fields computed from the application columns rather than read directly:
+# name -> (input columns, function)
+DERIVED_FIELDS = {
+    "monthly_instalment": (
+        ("loan_amount_usd", "interest_rate_percent", "repayment_period_months"),
+        _monthly_instalment,
+    ),
+}
+
+_PREDICATES = {
+    "outside": lambda v, r, c: (v < r["low"]) | (v > r["high"]),
+    "greater_than": lambda v, r, c: v > r["threshold"],
+    "less_than": lambda v, r, c: v < r["threshold"],
+    "equals": lambda v, r, c: v == r["value"],
+    "share_above": lambda v, r, c: v > r["share"] * c[r["of"]],
+}
+
+
+class CompiledRules:
+    def __init__(self, rules, override_threshold=OVERRIDE_THRESHOLD):
+        if len(rules) > 32:
+            raise ValueError("At most 32 rules fit in a flag bitmask")
+        for rule in rules:
+            if rule["kind"] not in _PREDICATES:
+                raise ValueError(f"Unknown rule kind for {rule['name']}: {rule['kind']}")
+            if rule.get("severity", "critical") not in SEVERITIES:
+                raise ValueError(f"Unknown severity for {rule['name']}: {rule['severity']}")
+        self.rules = rules
+        self.override_threshold = override_threshold
+        self.names = [rule["name"] for rule in rules]
+        self.critical = np.array([rule.get("severity", "critical") == "critical" for rule in rules])
+        self.bits = np.left_shift(np.uint32(1), np.arange(len(rules), dtype=np.uint32))
+        referenced = {f for rule in rules for f in (rule["field"], rule.get("of")) if f}
+        self.derived = [name for name in DERIVED_FIELDS if name in referenced]
+        self.input_fields = sorted(
+            (referenced - set(DERIVED_FIELDS))
+            | {f for name in self.derived for f in DERIVED_FIELDS[name][0]})
+        # Fields compared with numbers; anything but "equals" is numeric
+        numeric = {f for rule in rules if rule["kind"] != "equals" for f in (rule["field"], rule.get("of")) if f}
+        self.numeric_fields = (numeric - set(DERIVED_FIELDS)) \
+            | {f for name in self.derived for f in DERIVED_FIELDS[name][0]}
+
+    def _columns(self, df):
+        columns = {}
+        for field in self.input_fields:
+            series = df[field]
+            if field in self.numeric_fields and not is_numeric_dtype(series):
+                # e.g. "30" from a JSON body; a str must not reach a < or >
+                try:
+                    series = pd.to_numeric(series, errors="raise")
+                except (ValueError, TypeError) as e:
+                    raise ValueError(f"Non-numeric value(s) in: {field}") from e
+            columns[field] = series.to_numpy(dtype=float) if is_numeric_dtype(series) \
+                else series.astype(str).to_numpy()
+        for name in self.derived:
+            columns[name] = DERIVED_FIELDS[name][1](columns)
+        return columns
+
+    def evaluate(self, df):
+        # Returns per-row flag bitmasks, critical violation counts and
+        # override decisions, plus the columns needed to format messages
+        columns = self._columns(df)
+        masks = np.zeros((len(self.rules), len(df)), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            masks[i] = _PREDICATES[rule["kind"]](columns[rule["field"]], rule, columns)
+        flag_mask = (masks * self.bits[:, None]).sum(axis=0, dtype=np.uint32)
+        critical_violations = masks[self.critical].sum(axis=0, dtype=int)
+        overridden = critical_violations >= self.override_threshold
+        return flag_mask, critical_violations, overridden, columns
+
+    def messages(self, flag_mask, columns):
+        # Human-readable flags, formatted only for rows that tripped a rule
+        flags = [[] for _ in range(len(flag_mask))]
+        for i, rule in enumerate(self.rules):
+            template = rule["message"]
+            for row in np.flatnonzero(flag_mask & self.bits[i]):
+                values = {"value": columns[rule["field"]][row]}
+                if rule.get("of"):
+                    values["of_value"] = columns[rule["of"]][row]
+                flags[row].append(template.format(**{**rule, **values}) if "{" in template else template)
+        return flags
+
+
+def load_rules(path):
+    # JSON file: {"rules": [...], "override_threshold": 2}
+    with open(path) as f:
+        policy = json.load(f)
+    return CompiledRules(policy["rules"], policy.get("override_threshold", OVERRIDE_THRESHOLD))
+
+
+default_rules = CompiledRules(DEFAULT_RULES)
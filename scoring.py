@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+from metrics import increment, timed
+from rules import default_rules
+
+FEATURES = [
+    "age",
+    "gender",
+    "marital_status",
+    "employment_type",
+    "monthly_income_usd",
+    "number_of_dependents",
+    "education_level",
+    "loan_amount_usd",
+    "loan_type",
+    "repayment_period_months",
+    "interest_rate_percent",
+    "purpose_of_loan",
+    "residential_area_type",
+    "sector_of_activity",
+]
+
+CATEGORICAL_COLUMNS = [
+    "gender",
+    "marital_status",
+    "employment_type",
+    "education_level",
+    "loan_type",
+    "purpose_of_loan",
+    "residential_area_type",
+    "sector_of_activity",
+]
+
+def validate_columns(df):
+    missing = [col for col in FEATURES if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+
+def compile_encoders(label_encoders):
+    # Category -> code lookup tables, built once per model load. Codes match
+    # LabelEncoder.transform (position in the sorted classes_).
+    return {
+        col: {str(category): code for code, category in enumerate(label_encoders[col].classes_)}
+        for col in CATEGORICAL_COLUMNS
+    }
+
+
+def _unknown_categories(col, values):
+    # Unseen categories are rejected rather than mapped to a default code,
+    # since any code would silently stand for a real category
+    return ValueError(f"Unknown {col} value(s): {', '.join(sorted(set(values)))}")
+
+
+def _missing_values(columns):
+    return ValueError(f"Missing or non-numeric value(s) in: {', '.join(columns)}")
+
+
+def _check_finite(features):
+    # The compiled trees would route NaN down a branch and return a score;
+    # reject it like sklearn's input validation does
+    bad = ~np.isfinite(features).all(axis=0)
+    if bad.any():
+        raise _missing_values([col for col, is_bad in zip(FEATURES, bad) if is_bad])
+    return features
+
+
+def encode_frame(df, tables):
+    # Encoded float matrix in model feature order, one dict lookup per cell
+    features = np.empty((len(df), len(FEATURES)), dtype=np.float64)
+    for i, col in enumerate(FEATURES):
+        table = tables.get(col)
+        if table is None:
+            try:
+                features[:, i] = df[col].to_numpy(dtype=np.float64)
+            except (ValueError, TypeError):
+                raise _missing_values([col])
+            continue
+        # Checked before the lookup: str(None) is "None", which may be a
+        # real category (education_level)
+        if df[col].isna().any():
+            raise _missing_values([col])
+        values = df[col].astype(str)
+        codes = values.map(table)
+        unseen = codes.isna().to_numpy()
+        if unseen.any():
+            raise _unknown_categories(col, values[unseen])
+        features[:, i] = codes.to_numpy(dtype=np.float64)
+    return _check_finite(features)
+
+
+def encode_record(record, tables):
+    # Single-application fast path: plain Python into a preallocated row
+    features = np.empty((1, len(FEATURES)), dtype=np.float64)
+    row = features[0]
+    for i, col in enumerate(FEATURES):
+        value = record[col]
+        table = tables.get(col)
+        if table is None:
+            try:
+                row[i] = np.nan if value is None else value
+            except (ValueError, TypeError):
+                raise _missing_values([col])
+            continue
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            raise _missing_values([col])
+        code = table.get(str(value))
+        if code is None:
+            raise _unknown_categories(col, [str(value)])
+        row[i] = code
+    return _check_finite(features)
+
+
+def encoding_tables(bundle):
+    tables = bundle.get("encoders")
+    return tables if tables is not None else compile_encoders(bundle["label_encoders"])
+
+
+def score_frame(df, bundle, rules=default_rules, features=None):
+    # `features` may be passed in when the caller already encoded the rows
+    validate_columns(df)
+    if features is None:
+        with timed("encode"):
+            features = encode_frame(df, encoding_tables(bundle))
+    compiled = bundle.get("compiled")
+    with timed("predict"):
+        if compiled is not None:
+            # Class and probability from one pass over the flattened trees
+            model_pred, proba = compiled.predict(features)
+        else:
+            X = bundle["scaler"].transform(pd.DataFrame(features, columns=FEATURES))
+            proba = bundle["model"].predict_proba(X)
+            model_pred = bundle["model"].classes_.take(np.argmax(proba, axis=1))
+    pd_score = proba[:, 1]  # Probability of default (class 1)
+
+    # Override model if 2+ critical rules triggered
+    with timed("rules"):
+        flag_mask, critical_violations, overridden, rule_columns = rules.evaluate(df)
+        flags = rules.messages(flag_mask, rule_columns)
+    final_prediction = np.where(overridden, 1, model_pred)
+
+    result = df.copy()
+    result["pd_score"] = pd_score
+    result["model_prediction"] = model_pred
+    result["rule_mask"] = flag_mask
+    result["critical_violations"] = critical_violations
+    result["overridden"] = overridden
+    result["final_prediction"] = final_prediction
+    result["risk_label"] = np.where(final_prediction == 0, "Low Risk", "High Risk")
+    result["rule_flags"] = ["; ".join(f) for f in flags]
+    increment("rows_scored", len(result))
+    return result, flags
+
+
+def result_records(result, flags):
+    # Plain-Python per-row results, safe to serialize as JSON
+    return [
+        {
+            "pd_score": float(pd_score),
+            "model_prediction": int(model_pred),
+            "rule_mask": int(rule_mask),
+            "critical_violations": int(violations),
+            "overridden": bool(overridden),
+            "final_prediction": int(final_pred),
+            "risk_label": risk_label,
+            "rule_flags": row_flags,
+        }
+        for pd_score, model_pred, rule_mask, violations, overridden, final_pred, risk_label, row_flags in zip(
+            result["pd_score"], result["model_prediction"], result["rule_mask"], result["critical_violations"],
+            result["overridden"], result["final_prediction"], result["risk_label"], flags)
+    ]
+
+
+def score_applicant(applicant, bundle):
+    # "score_application" times one whole assessment; "predict" also covers
+    # batch and whole-book scoring
+    with timed("score_application"):
+        with timed("encode"):
+            features = encode_record(applicant, encoding_tables(bundle))
+        result, flags = score_frame(pd.DataFrame([applicant]), bundle, features=features)
+        return result_records(result, flags)[0]
+
+
+def read_upload(uploaded_file, chunksize=50_000):
+    # Yields raw application frames; CSV is read in chunks, Excel in one go.
+    # "None" is a real education_level category, so pandas' default NA
+    # strings are disabled and only empty cells count as missing.
+    name = getattr(uploaded_file, "name", str(uploaded_file)).lower()
+    na_options = {"keep_default_na": False, "na_values": [""]}
+    if name.endswith((".xlsx", ".xls")):
+        yield pd.read_excel(uploaded_file, **na_options)
+    else:
+        yield from pd.read_csv(uploaded_file, chunksize=chunksize, **na_options)
+
+
+def score_batches(frames, bundle):
+    for frame in frames:
+        result, _ = score_frame(frame, bundle)
+        yield result
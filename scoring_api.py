@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import pandas as pd
+import tornado.httputil
+import tornado.web
+
+from drift import record_scored
+from explain import explain_frame, top_factors
+from metrics import render_prometheus
+from model_registry import get_model_bundle, model_stats, model_version
+from scoring import result_records, score_frame
+
+# Headless scoring service for the loan-origination system. It shares the
+# model bundle and rule-override logic with the Streamlit app, and coalesces
+# concurrent requests into one predict_proba call per micro-batch.
+#
+#   POST /score   {"application": {...}}  or  {"applications": [{...}, ...]}
+#   POST /explain same payload; per-feature log-odds contributions
+#   GET  /health
+#
+# Every error, including 404s and unexpected 500s, is answered as JSON
+# {"error": "..."} like the 422s for applications that cannot be scored.
+#
+# deploy.py runs several of these processes on one port with --reuse-port.
+
+
+class MicroBatcher:
+    def __init__(self, max_wait_ms=5.0, max_batch_size=512):
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.rows = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, records):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def _collect(self):
+        # Block for the first request, then keep collecting until the window
+        # closes or the batch is full
+        pending = [await self.queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            try:
+                results = await loop.run_in_executor(None, _score_pending, pending)
+            except Exception as e:  # keep the batcher alive for later requests
+                results = [e] * len(pending)
+            for (_, future), result in zip(pending, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+            self.batches += 1
+            self.rows += sum(len(records) for records, _ in pending)
+
+
+def _explain_records(records):
+    bias, contributions = explain_frame(pd.DataFrame(records), get_model_bundle())
+    factors = top_factors(contributions.to_numpy())
+    return [
+        {"bias": float(bias), "contributions": row, "top_risk_factors": row_factors}
+        for row, row_factors in zip(contributions.to_dict("records"), factors)
+    ]
+
+
+def _score_records(records, bundle):
+    result, flags = score_frame(pd.DataFrame(records), bundle)
+    record_scored(result)  # drift monitoring, off the request path
+    return result_records(result, flags)
+
+
+def _score_pending(pending):
+    bundle = get_model_bundle()
+    records = [record for request_records, _ in pending for record in request_records]
+    try:
+        scored = _score_records(records, bundle)
+    except (ValueError, KeyError, TypeError):
+        # One bad request must not fail the others coalesced with it
+        results = []
+        for request_records, _ in pending:
+            try:
+                results.append(_score_records(request_records, bundle))
+            except (ValueError, KeyError, TypeError) as e:
+                results.append(e)
+        return results
+
+    results = []
+    offset = 0
+    for request_records, _ in pending:
+        results.append(scored[offset:offset + len(request_records)])
+        offset += len(request_records)
+    return results
+
+
+def _parse_applications(body):
+    # Returns (records, single) or raises a 400
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        raise tornado.web.HTTPError(400, reason="Request body is not valid JSON")
+
+    if isinstance(payload, dict) and isinstance(payload.get("applications"), list):
+        records, single = payload["applications"], False
+    elif isinstance(payload, dict) and isinstance(payload.get("application"), dict):
+        records, single = [payload["application"]], True
+    else:
+        raise tornado.web.HTTPError(400, reason="Expected 'application' object or 'applications' list")
+    if not records or not all(isinstance(r, dict) for r in records):
+        raise tornado.web.HTTPError(400, reason="Applications must be a non-empty list of objects")
+    return records, single
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    def write_error(self, status_code, **kwargs):
+        # The HTTPError's reason where one was given; never a traceback
+        error = kwargs.get("exc_info", (None, None))[1]
+        reason = getattr(error, "reason", None) or tornado.httputil.responses.get(status_code, "Unknown error")
+        self.finish({"error": reason})
+
+
+class NotFoundHandler(JSONHandler):
+    def prepare(self):
+        raise tornado.web.HTTPError(404)
+
+
+class ScoreHandler(JSONHandler):
+    def initialize(self, batcher):
+        self.batcher = batcher
+
+    async def post(self):
+        records, single = _parse_applications(self.request.body)
+        try:
+            results = await self.batcher.submit(records)
+        except (ValueError, KeyError, TypeError) as e:
+            self.set_status(422)
+            self.write({"error": str(e)})
+            return
+
+        response = {"model_version": model_version()}
+        if single:
+            response["result"] = results[0]
+        else:
+            response["results"] = results
+        self.write(response)
+
+
+class ExplainHandler(JSONHandler):
+    async def post(self):
+        records, single = _parse_applications(self.request.body)
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(None, _explain_records, records)
+        except (ValueError, KeyError, TypeError) as e:
+            self.set_status(422)
+            self.write({"error": str(e)})
+            return
+
+        response = {"model_version": model_version()}
+        if single:
+            response["result"] = results[0]
+        else:
+            response["results"] = results
+        self.write(response)
+
+
+class HealthHandler(JSONHandler):
+    def initialize(self, batcher):
+        self.batcher = batcher
+
+    def get(self):
+        self.write({
+            "status": "ok",
+            "pid": os.getpid(),
+            "model": model_stats(),
+            "batches": self.batcher.batches,
+            "rows": self.batcher.rows,
+        })
+
+
+class MetricsHandler(JSONHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(render_prometheus())
+
+
+def make_app(batcher):
+    return tornado.web.Application([
+        (r"/score", ScoreHandler, {"batcher": batcher}),
+        (r"/explain", ExplainHandler),
+        (r"/health", HealthHandler, {"batcher": batcher}),
+        (r"/metrics", MetricsHandler),
+    ], default_handler_class=NotFoundHandler)
+
+
+async def serve(host, port, max_wait_ms, max_batch_size, reuse_port=False):
+    get_model_bundle()  # warm the model before accepting traffic
+    batcher = MicroBatcher(max_wait_ms, max_batch_size)
+    batcher.start()
+    # With reuse_port several worker processes listen on one port and the
+    # kernel spreads connections across them (Linux)
+    make_app(batcher).listen(port, address=host, reuse_port=reuse_port)
+    print(f"Scoring API listening on http://{host}:{port} (pid {os.getpid()})")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MFI credit risk scoring API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="How long to collect concurrent requests into one batch")
+    parser.add_argument("--max-batch-size", type=int, default=512,
+                        help="Maximum rows scored in a single predict_proba call")
+    parser.add_argument("--reuse-port", action="store_true",
+                        help="Share the port with other scoring API processes (see deploy.py)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.max_wait_ms, args.max_batch_size, args.reuse_port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+from scoring import FEATURES, encode_record, encoding_tables, score_frame
+
+# What-if sweeps over loan structure for one applicant. Every combination of
+# amount, repayment period and interest rate is built as one frame, encoded
+# by tiling the applicant's encoded row, and scored in a single model pass
+# plus one vectorized rule evaluation.
+
+# Same ranges the screening form accepts
+LOAN_AMOUNTS = np.arange(50.0, 1500.0 + 1, 50.0)
+REPAYMENT_PERIODS = np.array([1, 3, 6])
+INTEREST_RATES = np.arange(5.0, 20.0 + 0.1, 2.5)
+
+_SWEPT = ("loan_amount_usd", "repayment_period_months", "interest_rate_percent")
+
+
+def structure_grid(applicant, amounts=LOAN_AMOUNTS, periods=REPAYMENT_PERIODS, rates=INTEREST_RATES):
+    # One row per (amount, period, rate); other fields copied from the applicant
+    amount, period, rate = (a.ravel() for a in np.meshgrid(amounts, periods, rates, indexing="ij"))
+    grid = pd.DataFrame({col: [applicant[col]] * len(amount) for col in FEATURES if col not in _SWEPT})
+    grid["loan_amount_usd"] = amount
+    grid["repayment_period_months"] = period
+    grid["interest_rate_percent"] = rate
+    return grid[FEATURES]
+
+
+def sweep(applicant, bundle, amounts=LOAN_AMOUNTS, periods=REPAYMENT_PERIODS, rates=INTEREST_RATES):
+    with timed("sensitivity"):
+        grid = structure_grid(applicant, amounts, periods, rates)
+        features = np.repeat(encode_record(applicant, encoding_tables(bundle)), len(grid), axis=0)
+        for col in _SWEPT:
+            features[:, FEATURES.index(col)] = grid[col].to_numpy(dtype=np.float64)
+        result, _ = score_frame(grid, bundle, features=features)
+    return result
+
+
+def largest_approvable(result):
+    # Largest approvable amount per (period, rate); NaN where nothing passes
+    approved = result[result["final_prediction"] == 0]
+    table = approved.pivot_table(index="interest_rate_percent", columns="repayment_period_months",
+                                 values="loan_amount_usd", aggfunc="max")
+    return table.reindex(index=np.unique(result["interest_rate_percent"]),
+                         columns=np.unique(result["repayment_period_months"]))
+
+
+def best_structure(result):
+    # Approvable row with the largest amount, lowest PD breaking ties; None if none
+    approved = result[result["final_prediction"] == 0]
+    if approved.empty:
+        return None
+    return approved.sort_values(["loan_amount_usd", "pd_score"], ascending=[False, True]).iloc[0]
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+
+import balancer
+
+# balancer.py in front of a small Tornado backend that echoes what it saw,
+# driven over raw keep-alive connections the way a browser reuses them.
+
+FORGED = b"X-Forwarded-For: 6.6.6.6\r\n"
+GET = b"GET / HTTP/1.1\r\nHost: app\r\n" + FORGED + b"\r\n"
+
+
+class Echo(tornado.web.RequestHandler):
+    def get(self):
+        self.write(f"{self.request.method} {self.request.headers.get('X-Forwarded-For', '-')}")
+
+    def post(self):
+        self.write(f"{self.request.method} {self.request.headers.get('X-Forwarded-For', '-')}")
+
+
+def _grant_post(grant, origin=b"http://app"):
+    return (b"POST /_mfi/session HTTP/1.1\r\nHost: app\r\nOrigin: " + origin +
+            b"\r\nContent-Length: " + str(len(grant)).encode() + b"\r\n\r\n" + grant)
+
+
+async def _read_response(reader):
+    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+    status_line, *headers = head[:-4].split(b"\r\n")
+    fields = {}
+    for line in headers:
+        name, _, value = line.partition(b":")
+        fields.setdefault(name.strip().lower(), []).append(value.strip())
+    body = await reader.readexactly(int(fields.get(b"content-length", [b"0"])[0]))
+    return int(status_line.split(b" ")[1]), fields, body
+
+
+def _exchange(monkeypatch, requests):
+    # Sends each request on one connection and returns the responses
+    monkeypatch.setattr(balancer, "redeem_session_grant",
+                        lambda grant: ("session-token", None) if grant == "good-grant" else None)
+
+    async def run():
+        sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+        backend = tornado.httpserver.HTTPServer(tornado.web.Application([(r"/", Echo)]))
+        backend.add_sockets(sockets)
+        _, server = await balancer.start("127.0.0.1", 0, [("127.0.0.1", sockets[0].getsockname()[1])])
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+        responses = []
+        try:
+            for request in requests:
+                writer.write(request)
+                await writer.drain()
+                responses.append(await _read_response(reader))
+        finally:
+            writer.close()
+            server.close()
+            backend.stop()
+        return responses
+
+    return asyncio.run(run())
+
+
+def test_every_request_gets_the_real_peer_address(monkeypatch):
+    responses = _exchange(monkeypatch, [GET, GET, GET])
+    assert [body for _, _, body in responses] == [b"GET 127.0.0.1"] * 3
+
+
+def test_first_response_sets_affinity_cookie(monkeypatch):
+    (status, fields, _), = _exchange(monkeypatch, [GET])
+    assert status == 200
+    assert any(c.startswith(b"mfi_worker=0;") for c in fields[b"set-cookie"])
+
+
+def test_grant_as_first_request_sets_session_cookie(monkeypatch):
+    (status, fields, _), = _exchange(monkeypatch, [_grant_post(b"good-grant")])
+    assert status == 204
+    assert fields[b"set-cookie"] == [b"mfi_session=session-token; Path=/; HttpOnly; SameSite=Lax"]
+
+
+def test_grant_on_reused_connection_is_answered_by_balancer(monkeypatch):
+    # A reload reuses the pooled connection that already served a page
+    responses = _exchange(monkeypatch, [GET, _grant_post(b"good-grant")])
+    assert responses[0][0] == 200
+    status, fields, body = responses[1]
+    assert status == 204 and body == b""
+    assert fields[b"set-cookie"] == [b"mfi_session=session-token; Path=/; HttpOnly; SameSite=Lax"]
+
+
+@pytest.mark.parametrize("request_bytes", [
+    _grant_post(b"bogus-grant"),
+    _grant_post(b"good-grant", origin=b"http://evil.example"),
+], ids=["unknown-grant", "foreign-origin"])
+def test_rejected_grant_on_reused_connection(monkeypatch, request_bytes):
+    responses = _exchange(monkeypatch, [GET, request_bytes])
+    status, fields, _ = responses[1]
+    assert status == 403
+    assert b"set-cookie" not in fields
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compiled_model import CompiledModel, _parity_samples, check_parity, compile_bundle
+from data_store import load_loans
+from model_registry import get_model_bundle
+from scoring import FEATURES, encode_frame, encode_record, encoding_tables, score_frame
+
+# Parity of the compiled tree evaluator with sklearn's predict/predict_proba,
+# for the in-memory, .npz and memory-mapped forms of the model.
+
+
+@pytest.fixture(scope="module")
+def bundle():
+    return get_model_bundle()
+
+
+@pytest.fixture(scope="module")
+def compiled(bundle):
+    return compile_bundle(bundle)
+
+
+@pytest.fixture(scope="module")
+def workbook_rows(bundle):
+    return pd.DataFrame(encode_frame(load_loans(), encoding_tables(bundle)), columns=FEATURES)
+
+
+@pytest.fixture(scope="module")
+def boundary_rows(bundle):
+    # Workbook rows, random rows and rows sitting exactly on split thresholds
+    return pd.DataFrame(_parity_samples(bundle, 2000, seed=0), columns=FEATURES)
+
+
+def test_workbook_rows_match_sklearn(bundle, compiled, workbook_rows):
+    report = check_parity(bundle, compiled, workbook_rows)
+    assert report["ok"], report
+
+
+def test_split_thresholds_match_sklearn(bundle, compiled, boundary_rows):
+    report = check_parity(bundle, compiled, boundary_rows)
+    assert report["ok"], report
+
+
+def test_npz_round_trip(bundle, compiled, boundary_rows, tmp_path):
+    path = tmp_path / "model.npz"
+    compiled.save(path)
+    report = check_parity(bundle, CompiledModel.load(path), boundary_rows)
+    assert report["ok"], report
+
+
+def test_load_shared_round_trip(bundle, compiled, boundary_rows, tmp_path):
+    compiled.export(tmp_path / "compiled")
+    shared = CompiledModel.load_shared(tmp_path / "compiled")
+    assert not shared.threshold.flags.writeable
+    report = check_parity(bundle, shared, boundary_rows)
+    assert report["ok"], report
+
+
+def test_registry_bundle_matches_sklearn(bundle, boundary_rows):
+    # The registry serves the memory-mapped arrays under .data_cache
+    report = check_parity(bundle, bundle["compiled"], boundary_rows)
+    assert report["ok"], report
+
+
+def test_score_frame_matches_sklearn_fallback(bundle):
+    loans = load_loans()[FEATURES]
+    compiled_result, _ = score_frame(loans, bundle)
+    fallback = {key: value for key, value in bundle.items() if key != "compiled"}
+    sklearn_result, _ = score_frame(loans, fallback)
+    np.testing.assert_allclose(compiled_result["pd_score"], sklearn_result["pd_score"], atol=1e-9)
+    assert (compiled_result["final_prediction"] == sklearn_result["final_prediction"]).all()
+
+
+@pytest.mark.parametrize("column", ["age", "monthly_income_usd", "loan_amount_usd"])
+def test_missing_numeric_value_is_rejected(bundle, column):
+    loans = load_loans()[FEATURES].head(5).copy()
+    loans[column] = loans[column].astype(np.float64)
+    loans.loc[loans.index[2], column] = np.nan
+    with pytest.raises(ValueError, match=column):
+        score_frame(loans, bundle)
+
+
+def test_missing_value_in_record_is_rejected(bundle):
+    record = load_loans()[FEATURES].iloc[0].to_dict()
+    record["monthly_income_usd"] = None
+    with pytest.raises(ValueError, match="monthly_income_usd"):
+        encode_record(record, encoding_tables(bundle))
+
+
+def test_missing_category_is_rejected(bundle):
+    # "None" is a real education_level; a null must not be looked up as it
+    loans = load_loans()[FEATURES].head(3).copy()
+    loans["education_level"] = loans["education_level"].astype(object)
+    loans.loc[loans.index[1], "education_level"] = None
+    with pytest.raises(ValueError, match="Missing.*education_level"):
+        score_frame(loans, bundle)
+    record = load_loans()[FEATURES].iloc[0].to_dict()
+    record["education_level"] = None
+    with pytest.raises(ValueError, match="Missing.*education_level"):
+        encode_record(record, encoding_tables(bundle))
+
+
+def test_numeric_strings_are_scored_like_numbers(bundle):
+    # JSON bodies may carry "30" for 30; the rules compare it as a number
+    loans = load_loans()[FEATURES].head(5)
+    as_text = loans.assign(age=loans["age"].astype(str).astype(object))
+    expected, expected_flags = score_frame(loans, bundle)
+    result, flags = score_frame(as_text, bundle)
+    np.testing.assert_array_equal(result["final_prediction"], expected["final_prediction"])
+    assert flags == expected_flags
+
+
+def test_non_numeric_rule_field_is_rejected(bundle):
+    loans = load_loans()[FEATURES].head(3).copy()
+    loans["number_of_dependents"] = loans["number_of_dependents"].astype(object)
+    loans.loc[loans.index[0], "number_of_dependents"] = "two"
+    with pytest.raises(ValueError, match="number_of_dependents"):
+        score_frame(loans, bundle)
+
+
+def test_unknown_category_is_rejected(bundle):
+    loans = load_loans()[FEATURES].head(3).copy()
+    loans["loan_type"] = loans["loan_type"].astype(str)
+    loans.loc[loans.index[0], "loan_type"] = "Not a loan type"
+    with pytest.raises(ValueError, match="loan_type"):
+        score_frame(loans, bundle)
+
+
+def test_unused_features_get_zero_contribution(bundle, compiled, workbook_rows):
+    model = bundle["model"]
+    used = set()
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        used.update(tree.feature[tree.children_left != -1].tolist())
+    unused = [i for i in range(len(FEATURES)) if i not in used]
+    assert unused  # the shipped model splits on a subset of the features
+    _, contributions = compiled.contributions(workbook_rows)
+    assert np.all(contributions[:, unused] == 0)
+
+
+def test_contributions_reconstruct_raw_score(compiled, boundary_rows):
+    bias, contributions = compiled.contributions(boundary_rows)
+    X_scaled = (boundary_rows.to_numpy() - compiled.mean) / compiled.scale
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), compiled.decision_function(X_scaled), atol=1e-9)
+
+
+def test_internal_values_are_weighted_means_of_leaves(bundle, compiled):
+    # Each root holds its tree's sample-weighted mean leaf value, so the bias
+    # is the expected raw score and deltas share the leaves' scale
+    for tree_index, estimator in enumerate(bundle["model"].estimators_[:, 0]):
+        tree = estimator.tree_
+        leaves = tree.children_left == -1
+        expected = np.average(tree.value[leaves, 0, 0], weights=tree.weighted_n_node_samples[leaves])
+        assert compiled.value[compiled.roots[tree_index]] == pytest.approx(expected)
@@ -0,0 +1,238 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.metrics import accuracy_score, f1_score, log_loss, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from compiled_model import check_parity, compile_bundle
+from data_store import CACHE_DIR, WORKBOOK_PATH, load_loans
+from db import APPLICATION_FEATURES, DB_PATH, connection, init_db
+from ingest import iter_chunks
+from model_registry import MODEL_PATH, metadata_path
+from scoring import CATEGORICAL_COLUMNS, FEATURES
+
+# Offline retraining for the credit risk model bundle.
+#
+#   python train.py                          # workbook, full grid, all cores
+#   python train.py --source applications    # screened applications with outcomes
+#   python train.py --source history.parquet --promote
+#
+# The bundle keeps the original layout (model, scaler, label_encoders,
+# features), so the app, the compiled evaluator and the scoring API load it
+# unchanged. Preprocessing runs once per training set: the encoded and
+# scaled matrices are cached under CACHE_DIR by content hash and shared by
+# every search trial. GridSearchCV fans the fits out over a process pool, and
+# joblib memory-maps the cached matrix into the workers instead of copying it.
+# Each run writes models/<version>/ with the artifact and its metadata;
+# --promote copies both next to MODEL_PATH, where the registry and the
+# sidebar pick them up.
+
+MODELS_DIR = "models"
+LABEL = "default_status"
+
+PARAM_GRIDS = {
+    "quick": {
+        "n_estimators": [100],
+        "learning_rate": [0.1],
+        "max_depth": [2, 3],
+    },
+    "full": {
+        "n_estimators": [100, 200, 300],
+        "learning_rate": [0.05, 0.1],
+        "max_depth": [2, 3, 4],
+        "subsample": [0.8, 1.0],
+    },
+}
+
+SELECT_LABELLED_APPLICATIONS = (
+    f"SELECT {', '.join(f'{column} AS {feature}' for column, feature in APPLICATION_FEATURES.items())}, "
+    f"{LABEL} FROM applications WHERE {LABEL} IS NOT NULL"
+)
+
+
+def load_training_frame(source, db_path=DB_PATH):
+    if source == "workbook":
+        df = load_loans(WORKBOOK_PATH)
+    elif source == "applications":
+        init_db(db_path)
+        with connection(db_path) as conn:
+            df = pd.read_sql(SELECT_LABELLED_APPLICATIONS, conn)
+    else:
+        df = pd.concat(list(iter_chunks(source)), ignore_index=True)
+
+    missing = [col for col in FEATURES + [LABEL] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Training data is missing columns: {', '.join(missing)}")
+    df = df[FEATURES + [LABEL]].dropna()
+    if df[LABEL].nunique() != 2:
+        raise ValueError(f"Need both outcomes in {LABEL} to train; got {len(df)} labelled rows")
+    return df
+
+
+def _frame_hash(df):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _preprocess(df):
+    label_encoders = {}
+    encoded = pd.DataFrame(index=df.index)
+    for col in FEATURES:
+        if col in CATEGORICAL_COLUMNS:
+            encoder = LabelEncoder()
+            encoded[col] = encoder.fit_transform(df[col].astype(str))
+            label_encoders[col] = encoder
+        else:
+            encoded[col] = df[col].to_numpy(dtype=np.float64)
+    scaler = StandardScaler().fit(encoded)
+    X = scaler.transform(encoded)
+    y = df[LABEL].to_numpy(dtype=np.int64)
+    return X, y, scaler, label_encoders
+
+
+def preprocessed(df):
+    # (X, y, scaler, label_encoders, data_hash); reuses the cached matrices
+    # when the same training set was prepared before
+    data_hash = _frame_hash(df)
+    cache_file = os.path.join(CACHE_DIR, f"train-{data_hash}.joblib")
+    if os.path.exists(cache_file):
+        X, y, scaler, label_encoders = joblib.load(cache_file, mmap_mode="r")
+    else:
+        X, y, scaler, label_encoders = _preprocess(df)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{cache_file}.{os.getpid()}.tmp"
+        joblib.dump((X, y, scaler, label_encoders), tmp)
+        os.replace(tmp, cache_file)
+    return X, y, scaler, label_encoders, data_hash
+
+
+def _holdout_metrics(model, X, y):
+    proba = model.predict_proba(X)[:, 1]
+    pred = model.classes_.take((proba >= 0.5).astype(int))
+    return {
+        "accuracy": accuracy_score(y, pred),
+        "roc_auc": roc_auc_score(y, proba),
+        "precision": precision_score(y, pred, zero_division=0),
+        "recall": recall_score(y, pred, zero_division=0),
+        "f1": f1_score(y, pred, zero_division=0),
+        "log_loss": log_loss(y, proba),
+    }
+
+
+def train(source="workbook", grid="full", cv=5, test_size=0.2, seed=42, n_jobs=-1, db_path=DB_PATH):
+    started = time.perf_counter()
+    df = load_training_frame(source, db_path)
+    X, y, scaler, label_encoders, data_hash = preprocessed(df)
+    preprocess_seconds = time.perf_counter() - started
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, stratify=y, random_state=seed)
+    search = GridSearchCV(
+        GradientBoostingClassifier(random_state=seed),
+        PARAM_GRIDS[grid],
+        scoring="roc_auc",
+        cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed),
+        n_jobs=n_jobs,
+        refit=True,
+    )
+    search_started = time.perf_counter()
+    search.fit(X_train, y_train)
+    search_seconds = time.perf_counter() - search_started
+    holdout = _holdout_metrics(search.best_estimator_, X_test, y_test)
+
+    # Final model: best parameters refit on every labelled row
+    model = GradientBoostingClassifier(random_state=seed, **search.best_params_).fit(X, y)
+    bundle = {"model": model, "scaler": scaler, "label_encoders": label_encoders, "features": list(FEATURES)}
+    parity = check_parity(bundle, compile_bundle(bundle), pd.DataFrame(
+        scaler.inverse_transform(X), columns=FEATURES))
+    if not parity["ok"]:
+        raise RuntimeError(f"Compiled evaluator disagrees with the trained model: {parity}")
+
+    metadata = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source": source,
+        "data_hash": data_hash,
+        "rows": int(len(y)),
+        "default_rate": float(y.mean()),
+        "features": list(FEATURES),
+        "grid": grid,
+        "candidates": len(search.cv_results_["params"]),
+        "cv_folds": cv,
+        "best_params": search.best_params_,
+        "cv_roc_auc": float(search.best_score_),
+        "holdout": {name: float(value) for name, value in holdout.items()},
+        "accuracy": float(holdout["accuracy"]),
+        "seconds": {
+            "preprocess": round(preprocess_seconds, 3),
+            "search": round(search_seconds, 3),
+            "total": round(time.perf_counter() - started, 3),
+        },
+        "seed": seed,
+        "python": platform.python_version(),
+        "sklearn": sklearn.__version__,
+    }
+    return bundle, metadata
+
+
+def write_artifact(bundle, metadata, models_dir=MODELS_DIR):
+    version = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{metadata['data_hash'][:8]}"
+    directory = os.path.join(models_dir, version)
+    os.makedirs(directory, exist_ok=True)
+    artifact = os.path.join(directory, os.path.basename(MODEL_PATH))
+    joblib.dump(bundle, artifact)
+    with open(artifact, "rb") as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    metadata = {**metadata, "version": version, "sha256": sha256}
+    with open(metadata_path(artifact), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return artifact, metadata
+
+
+def promote(artifact, model_path=MODEL_PATH):
+    # Metadata first, so the sidebar never pairs the new model with stale
+    # numbers; the registry reloads on the model file's content hash
+    for source, target in ((metadata_path(artifact), metadata_path(model_path)), (artifact, model_path)):
+        tmp = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the credit risk model bundle")
+    parser.add_argument("--source", default="workbook",
+                        help="'workbook', 'applications', or a csv/parquet/feather file with default_status")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--grid", choices=sorted(PARAM_GRIDS), default="full")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Worker processes for the search (-1 = all cores)")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--promote", action="store_true", help=f"Install the new bundle as {MODEL_PATH}")
+    args = parser.parse_args()
+
+    bundle, metadata = train(args.source, args.grid, args.cv, args.test_size, args.seed, args.n_jobs, args.db)
+    artifact, metadata = write_artifact(bundle, metadata, args.models_dir)
+    holdout = metadata["holdout"]
+    print(f"Trained on {metadata['rows']:,} rows in {metadata['seconds']['total']}s "
+          f"({metadata['candidates']} candidates x {metadata['cv_folds']} folds)")
+    print(f"Best params {metadata['best_params']}: CV ROC AUC {metadata['cv_roc_auc']:.3f}, "
+          f"holdout accuracy {holdout['accuracy']:.3f}, ROC AUC {holdout['roc_auc']:.3f}")
+    print(f"Wrote {artifact}")
+    if args.promote:
+        promote(artifact)
+        print(f"Promoted to {MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()